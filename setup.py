@@ -24,6 +24,7 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=["Click", "pandas", "requests"],
+    extras_require={"arrow": ["pyarrow"]},
     entry_points={
         "console_scripts": [
             "readactor = src.scripts.readactor:cli",
@@ -4,6 +4,7 @@ import sys
 
 import pandas as pd
 
+from src.scripts import readact_snapshot
 from src.scripts.authenticity_space import read_space_csv
 
 PERSON_GITHUB = (
@@ -20,30 +21,63 @@ AGENT_GITHUB = (
 logger = logging.getLogger(__name__)
 
 
-def search_wikidataID_in_table(row, agent_processed, agent_id):
-    df_tmp = agent_processed[agent_processed["agent_id"] == row[agent_id]]
-    # ToDo(QG): here should raise an error if the length > 1
-    if len(df_tmp.index) == 1:
-        if df_tmp.iloc[0]["wikidata_id"].startswith("Q"):
-            row["wikidata_id"] = df_tmp.iloc[0]["wikidata_id"]
-    return row
-
-
 def addWikidataID_and_replaceSpace(
     df_PI_gh, agent_processed, agent_id, place_dict, entity_type
 ):
-    for index, row in df_PI_gh.iterrows():
-        if entity_type == "Institution":
-            if row["place"] in place_dict:
-                row["place"] = place_dict[row["place"]][0]
-        elif entity_type == "Person":
-            if row["place_of_birth"] in place_dict:
-                row["place_of_birth"] = place_dict[row["place_of_birth"]][0]
-        result = search_wikidataID_in_table(row, agent_processed, agent_id)
-        df_PI_gh.loc[index] = result
+    """
+    Replace the space_id in the place column with the space_name, and fill `wikidata_id` from the Agent table for
+    every agent_id which occurs exactly once there with a wikidata_id starting with "Q".
+    :param df_PI_gh: dataframe of a Person or Institution table, with a `wikidata_id` column
+    :param agent_processed: dataframe of the Agent table
+    :param agent_id: "person_id" or "inst_id"
+    :param place_dict: a dictionary, key: space_id, value: [space_name, space_type, lat, long]
+    :param entity_type: "Person" or "Institution"
+    :return: the processed dataframe
+    """
+    if entity_type == "Institution":
+        place_name = "place"
+    elif entity_type == "Person":
+        place_name = "place_of_birth"
+    places = df_PI_gh[place_name]
+    df_PI_gh[place_name] = places.map({k: v[0] for k, v in place_dict.items()}).where(
+        places.isin(list(place_dict)), places
+    )
+
+    # ToDo(QG): here should raise an error if an agent_id occurs more than once
+    agents = agent_processed.drop_duplicates("agent_id", keep=False).set_index(
+        "agent_id"
+    )["wikidata_id"]
+    agents = agents[agents.str.startswith("Q", na=False)]
+    df_PI_gh["wikidata_id"] = (
+        df_PI_gh[agent_id].map(agents).fillna(df_PI_gh["wikidata_id"])
+    )
     return df_PI_gh
 
 
+def sync_agent_wikidata_ids(df_agent, df, agent_id, today):
+    """
+    Copy the `wikidata_id` of the checked Person/Institution rows into the Agent table. The agents whose
+    `wikidata_id` changes get `last_modified` and `last_modified_by` updated as well.
+    :param df_agent: dataframe of the Agent table, it is updated in place
+    :param df: dataframe of the checked Person/Institution table
+    :param agent_id: "person_id" or "inst_id"
+    :param today: the date for `last_modified`
+    :return: the updated Agent table
+    """
+    # If an agent has several rows (languages), the last one wins
+    wikidata_ids = df.drop_duplicates(agent_id, keep="last").set_index(agent_id)[
+        "wikidata_id"
+    ]
+    new_wikidata_ids = df_agent["agent_id"].map(wikidata_ids)
+    updated = new_wikidata_ids.notna() & (new_wikidata_ids != df_agent["wikidata_id"])
+    df_agent.loc[updated, "wikidata_id"] = new_wikidata_ids[updated]
+    df_agent.loc[updated, "last_modified"] = today
+    df_agent.loc[updated, "last_modified_by"] = "ReadActor"
+    if updated.any():
+        logger.info("Wikidata id is updated for %s agents. " % updated.sum())
+    return df_agent
+
+
 def combine_agent_tables(df_agent_user, df_agent_gh, all_agents_ids_gh):
     """
     This function aims to use merging the Agent tables in ReadAct and in user's directory. If any agent_id in the
@@ -79,7 +113,9 @@ def combine_agent_tables(df_agent_user, df_agent_gh, all_agents_ids_gh):
 
 def preparation():
     place_dict = read_space_csv()
-    df_agent_gh = pd.read_csv(AGENT_GITHUB).fillna("")  # Get Agent table from ReadAct
+    df_agent_gh = readact_snapshot.read_csv(AGENT_GITHUB).fillna(
+        ""
+    )  # Get Agent table from ReadAct
     all_agents_ids_gh = list(
         set(df_agent_gh["agent_id"].tolist())
     )  # Get all the unique agent_ids
@@ -128,14 +164,21 @@ def process_agent_tables(entity_type, user_or_ReadAct, path):
         )
 
     all_wikidata_ids = [x for x in agent_processed["wikidata_id"].tolist() if x]
-    df_P_or_I_gh = pd.read_csv(which_agent, dtype=dtype_dict).fillna("")
+    df_P_or_I_gh = readact_snapshot.read_csv(which_agent, dtype=dtype_dict).fillna("")
 
     print("************************")
     print("df_P_or_I_gh original: ", df_P_or_I_gh)
 
     # Check if the place in user's Person/Institution table are all in ReadAct.
     # So that to get a processed space table to convert space IDs in P/I into space names.
-    if all(place in place_dict for place in df_P_or_I_gh[place_name].tolist()):
+    unknown_places = list(
+        dict.fromkeys(
+            place
+            for place in df_P_or_I_gh[place_name].tolist()
+            if place not in place_dict
+        )
+    )
+    if len(unknown_places) == 0:
         place_dict_combined = place_dict
 
         combined_two_space = False  # Unnecessary to check for potential local Space.csv
@@ -143,7 +186,8 @@ def process_agent_tables(entity_type, user_or_ReadAct, path):
         space_path_user = path[1][:-9] + "Space.csv"
         if not os.path.isfile(space_path_user):
             logger.error(
-                "There's place in your Institution/Person table without providing according space table. Please check."
+                "There's place in your Institution/Person table without providing according space table. Please check: "
+                + ", ".join(str(place) for place in unknown_places)
             )
             sys.exit()
         else:
@@ -0,0 +1,202 @@
+"""
+An asyncio engine to check the rows of a table concurrently.
+
+The checks of one row (`check_each_row_Person`, `check_each_row_Inst`, `check_each_row_Space`) spend nearly all of
+their time waiting for Wikidata, so several rows are checked at the same time, with at most `concurrency` rows in
+flight. The checks themselves are blocking (`requests`): asyncio only schedules them on a pool of threads, each with its
+own HTTP session (see `http_client.get_session`). The checked rows are returned in the order of the input table, so that the output is the
+same as when the rows are checked one by one. If the check of a row aborts (e.g. `sys.exit()` on a conflict), the
+rows after it are not started any more and the abort of the first such row is raised again.
+
+`write_rows` puts the checked rows back into the table. Only the cells a check changed are collected, column by
+column, and each changed column is written once, instead of assigning every row with `df.loc[index] = row`.
+
+`check_in_processes` spreads the rows of a large table over `workers` processes for the work which is bound by the
+CPU rather than by Wikidata. The rows are split into shards by the ID of their entity, so that all the language rows
+of a person, an institution or a space are checked in the same process, and the checked rows are put back in the
+order of the input table. The rows of each shard are handed to `on_checked` (e.g. `journal.record`) as soon as the
+shard is done, so that they are not lost if another shard aborts. The ReadAct tables are shared with the processes
+through `shared_frames`. Each process is started with the settings of this one (cache, ReadAct snapshot, Wikidata
+backend), its own connections, and a 1/`workers` share of the request rate of each host, so that the processes
+together do not query faster than this one.
+"""
+import asyncio
+import functools
+import logging
+import math
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from src.scripts import (
+    cache,
+    http_client,
+    rate_limiter,
+    readact_snapshot,
+    shared_frames,
+    wikidata_api,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def check_rows(rows, check, concurrency=1):
+    """
+    :param rows: an iterable of (index, row), e.g. `df.iterrows()`
+    :param check: a function `check(index, row)` which returns the checked row
+    :param concurrency: the maximum number of rows checked at the same time, 1 to check them one by one
+    :return: a list of the checked rows, in the order of `rows`
+    """
+    if concurrency <= 1:
+        return [check(index, row) for index, row in rows]
+    return asyncio.run(_check_rows(list(rows), check, concurrency))
+
+
+async def _check_rows(rows, check, concurrency):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    first_abort = [math.inf]  # position of the first row whose check aborted
+
+    async def check_one(position, index, row):
+        async with semaphore:
+            if position > first_abort[0]:
+                return None  # a row before this one aborted the run already
+            try:
+                return await loop.run_in_executor(executor, check, index, row)
+            except (Exception, SystemExit) as e:
+                first_abort[0] = min(first_abort[0], position)
+                return e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = await asyncio.gather(
+            *(
+                check_one(position, index, row)
+                for position, (index, row) in enumerate(rows)
+            )
+        )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def check_in_processes(
+    df, id_column, check_row, context, workers, concurrency=1, on_checked=None
+):
+    """
+    Check the rows of `df` in `workers` processes, each with `concurrency` rows at the same time.
+    :param df: the rows to check
+    :param id_column: the column of the entity ID, e.g. "person_id"
+    :param check_row: a module-level function `check_row(index, row, context)` which returns the checked row
+    :param context: everything `check_row` needs besides the row, sent once to each process
+    :param workers: the number of processes
+    :param concurrency: the maximum number of rows checked at the same time in each process
+    :param on_checked: a function `on_checked(index, row, checked)` called for each row of a shard as soon as the
+    shard is done, e.g. to journal it
+    :return: a function `check(index, row)` which returns the row checked in the processes, to be passed to
+    `check_rows`. A row whose shard aborted is checked again in this process, so that the abort is raised in order.
+    """
+    results = {}
+    # the ReadAct tables in `context` are sent to the processes as memory-mapped Arrow files, if possible
+    shared_context = shared_frames.share(context)
+    shards = [shard for _, shard in df.groupby(shard_ids(df[id_column], workers))]
+    if shards:
+        processes = min(workers, len(shards))
+        settings = {
+            module.__name__: module.settings()
+            for module in [cache, rate_limiter, readact_snapshot, wikidata_api]
+        }
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_start_worker,
+            initargs=(settings, processes),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _check_shard, shard, check_row, shared_context, concurrency
+                ): shard
+                for shard in shards
+            }
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    checked_rows = future.result()
+                except (Exception, SystemExit) as e:
+                    logger.warning(
+                        "The check of %s rows aborted in a worker process: %r"
+                        % (len(shard), e)
+                    )
+                    continue
+                results.update(zip(shard.index, checked_rows))
+                if on_checked is not None:
+                    for (index, row), checked in zip(shard.iterrows(), checked_rows):
+                        on_checked(index, row, checked)
+
+    def check(index, row):
+        if index in results:
+            return results[index]
+        return check_row(index, row, context)
+
+    return check
+
+
+def shard_ids(ids, workers):
+    """
+    :param ids: the entity IDs of the rows
+    :param workers: the number of shards
+    :return: the shard of each row, the same for the same ID in every run
+    """
+    return (
+        ids.fillna("")
+        .astype(str)
+        .map(lambda x: zlib.crc32(x.encode("utf-8")) % workers)
+    )
+
+
+def _start_worker(settings, processes):
+    # the connections inherited from the parent process must not be used in this one
+    cache.reset()
+    http_client.reset()
+    for module in [cache, rate_limiter, readact_snapshot, wikidata_api]:
+        if module.settings() != settings[module.__name__]:
+            module.configure(**settings[module.__name__])
+    rate_limiter.configure(share=settings[rate_limiter.__name__]["share"] / processes)
+
+
+def _check_shard(shard, check_row, context, concurrency):
+    return check_rows(
+        shard.iterrows(), functools.partial(check_row, context=context), concurrency
+    )
+
+
+def write_rows(df, rows):
+    """
+    Write the checked rows back into `df`, in place.
+    :param df: the table the rows come from
+    :param rows: the checked rows with the columns of `df`, in its order, e.g. the result of `check_rows`
+    :return: the number of changed cells
+    """
+    columns = list(df.columns)
+    # column: ([positions of the changed cells], [new values])
+    changes = {}
+    for position, (old_values, row) in enumerate(
+        zip(df.itertuples(index=False, name=None), rows)
+    ):
+        for column, old, new in zip(columns, old_values, row.tolist()):
+            if not _same(old, new):
+                positions, values = changes.setdefault(column, ([], []))
+                positions.append(position)
+                values.append(new)
+    for column, (positions, values) in changes.items():
+        column_values = df[column].to_numpy(dtype=object, copy=True)
+        column_values[positions] = values
+        df[column] = pd.Series(column_values, index=df.index).infer_objects()
+    return sum(len(positions) for positions, _ in changes.values())
+
+
+def _same(old, new):
+    try:
+        return bool(old == new or (pd.isna(old) and pd.isna(new)))
+    except (TypeError, ValueError):
+        return False
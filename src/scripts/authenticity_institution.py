@@ -10,44 +10,43 @@ The standards of verificating an Institution entry is:
 to find one match among headquarters/administrativeTerritorialEntity/locationOfFormation/inception.
 """
 import json
+import logging
+import re
 import sys
-import time
 
-import pandas as pd
-import requests
-
-from src.scripts.authenticity_space import read_space_csv
+from src.scripts import http_client, readact_snapshot, wikidata_api
+from src.scripts.authenticity_space import TOP_K, get_QIDs, read_space_csv
 
 MEDIAWIKI_API_URL = "https://www.wikidata.org/w/api.php"
 URL = "https://query.wikidata.org/sparql"
-QUERY1 = """
-PREFIX  schema: <http://schema.org/>
-PREFIX  bd:   <http://www.bigdata.com/rdf#>
-PREFIX  wdt:  <http://www.wikidata.org/prop/direct/>
-PREFIX  wikibase: <http://wikiba.se/ontology#>
-
-SELECT DISTINCT  ?item ?itemLabel ?headquartersLabel ?administrativeTerritorialEntityLabel 
+QUERY_WITH_QIDS = """
+SELECT DISTINCT ?item ?itemLabel ?headquartersLabel ?administrativeTerritorialEntityLabel
 ?locationOfFormationLabel ?inceptionLabel
 WHERE
-  {{ ?article schema:about ?item ;
-    FILTER ( ?item = <http://www.wikidata.org/entity/"""
-
-QUERY2 = """> )
+  {{ VALUES ?item {{ {} }}
+    FILTER EXISTS {{ ?article schema:about ?item }}
     OPTIONAL
-      { ?item  wdt:P159  ?headquarters }
+      {{ ?item  wdt:P159  ?headquarters }}
     OPTIONAL
-      { ?item  wdt:P131  ?administrativeTerritorialEntity }
+      {{ ?item  wdt:P131  ?administrativeTerritorialEntity }}
     OPTIONAL
-      { ?item wdt:P740   ?locationOfFormation }
+      {{ ?item wdt:P740   ?locationOfFormation }}
     OPTIONAL
-      { ?item wdt:P571  ?inception }
+      {{ ?item wdt:P571  ?inception }}
     SERVICE wikibase:label
-      { bd:serviceParam wikibase:language  "[AUTO_LANGUAGE], en"
-      }
+      {{ bd:serviceParam wikibase:language  "[AUTO_LANGUAGE], en"
+      }}
   }}
-GROUP BY ?item ?itemLabel ?headquartersLabel ?administrativeTerritorialEntityLabel 
-?locationOfFormationLabel  ?inceptionLabel 
 """
+INST_BATCH_SIZE = 200  # number of Q-identifiers sent in one VALUES clause
+INST_PROPERTIES = [
+    "headquarters",
+    "administrativeTerritorialEntity",
+    "locationOfFormation",
+    "inception",
+]
+
+logger = logging.getLogger(__name__)
 
 
 def read_institution_csv(
@@ -58,7 +57,7 @@ def read_institution_csv(
     :param inst_url: the GitHub address of Institution.csv
     :return: a dictionary
     """
-    df = pd.read_csv(inst_url)
+    df = readact_snapshot.read_csv(inst_url)
     df = df.fillna("")
     ins_dict = {}
     place_dict = read_space_csv()
@@ -89,11 +88,16 @@ def read_institution_csv(
     return ins_dict
 
 
-def compare_inst(inst_dict, sleep=2):
+def compare_inst(inst_dict):
     no_match = {}
     match = {}
+    # Look all institutions up first, then fetch the properties of all found QIDs at once
+    found = {k: get_QID_inst(k[1], v[0], v[1]) for k, v in inst_dict.items()}
+    inst_wikis = sparql_insts(
+        [x["id"] for results in found.values() if results for x in results]
+    )
     for k, v in inst_dict.items():
-        results = get_QID_inst(k[1])
+        results = found[k]
         if results is None:
             no_match[k] = v
             continue
@@ -101,7 +105,10 @@ def compare_inst(inst_dict, sleep=2):
         if q_ids is None:
             no_match[k] = v
             continue
-        inst_wiki_dict = sparql_inst(q_ids, sleep)
+        if all(q in inst_wikis for q in q_ids):
+            inst_wiki_dict = merge_insts(inst_wikis, q_ids)
+        else:  # the bulk query failed
+            inst_wiki_dict = sparql_inst(q_ids)
         if (
             len(inst_wiki_dict["headquarters"]) > 0
             and v[0] in inst_wiki_dict["headquarters"]
@@ -131,82 +138,159 @@ def compare_inst(inst_dict, sleep=2):
     return no_match, match
 
 
-def sparql_inst(q_ids, sleep=2):
+def sparql_inst(q_ids):
+    """
+    :param q_ids: a list of Q-identifiers
+    :return: a dictionary with the name, headquarters, administrativeTerritorialEntity, locationOfFormation,
+    inception and QID. For several Q-identifiers, the properties of all of them are put together and the name and
+    QID are those of the first one. An empty dictionary if the query failed.
+    """
     if q_ids is None:
         return []
+    return merge_insts(sparql_insts(q_ids), q_ids)
+
+
+def merge_insts(inst_wikis, q_ids):
+    """
+    :param inst_wikis: the result of `sparql_insts`
+    :param q_ids: a list of Q-identifiers
+    :return: the properties of all `q_ids` put together, like `sparql_inst`
+    """
     inst_wiki = {}
-    with requests.Session() as s:
-        for q in q_ids:
-            response = s.get(
-                URL, params={"format": "json", "query": QUERY1 + q + QUERY2}
-            )
-            if response.status_code == 200:  # a successful response
-                results = response.json().get("results", {}).get("bindings")
-                (
-                    inst_wiki["name"],
-                    inst_wiki["headquarters"],
-                    inst_wiki["administrativeTerritorialEntity"],
-                    inst_wiki["locationOfFormation"],
-                    inst_wiki["inception"],
-                    inst_wiki["QID"],
-                ) = ([], [], [], [], [], [])
-                if q is not None:
-                    inst_wiki["QID"] = q
-                if results:
-                    for b in results:
-                        if "itemLabel" in b:
-                            inst_wiki["name"] = b["itemLabel"]["value"]
-                        if "headquartersLabel" in b:
-                            headquarters = b["headquartersLabel"]["value"]
-                            inst_wiki["headquarters"].append(headquarters)
-                        if "administrativeTerritorialEntityLabel" in b:
-                            administrativeTerritorialEntity = b[
-                                "administrativeTerritorialEntityLabel"
-                            ]["value"]
-                            inst_wiki["administrativeTerritorialEntity"].append(
-                                administrativeTerritorialEntity
-                            )
-                        if "locationOfFormationLabel" in b:
-                            locationOfFormation = b["locationOfFormationLabel"]["value"]
-                            inst_wiki["locationOfFormation"].append(locationOfFormation)
-                        if "inceptionLabel" in b:
-                            inception = b["inceptionLabel"]["value"]
-                            inst_wiki["inception"].append(inception)
-            time.sleep(sleep)
+    for q in q_ids:
+        if q not in inst_wikis:
+            continue
+        if not inst_wiki:
+            inst_wiki = {
+                k: v[:] if isinstance(v, list) else v for k, v in inst_wikis[q].items()
+            }
+        else:
+            for p in INST_PROPERTIES:
+                inst_wiki[p] += inst_wikis[q][p]
     return inst_wiki
 
 
-def get_QID_inst(lookup):
-    params = {
-        "action": "wbsearchentities",
-        "language": "en",
-        "search": lookup,
-        "format": "json",
-        "limit": 10,
+def sparql_insts(q_ids, batch_size=INST_BATCH_SIZE):
+    """
+    The bulk version of `sparql_inst`: many Q-identifiers are put into the VALUES clause of one SPARQL query.
+    :param q_ids: a list of Q-identifiers
+    :param batch_size: the number of Q-identifiers in one query
+    :return: a dictionary, key: Q-identifier, value: the dictionary of its properties as returned by `sparql_inst`.
+    Q-identifiers whose query failed are not in the dictionary.
+    """
+    if wikidata_api.enabled():
+        return wikidata_api.get_institutions(q_ids)
+    inst_wikis = {}
+    q_ids = list(dict.fromkeys(q for q in q_ids if re.fullmatch(r"Q\d+", str(q))))
+    for i in range(0, len(q_ids), batch_size):
+        batch = q_ids[i : i + batch_size]
+        data = http_client.get_json(
+            URL,
+            params={
+                "format": "json",
+                "query": QUERY_WITH_QIDS.format(" ".join("wd:" + q for q in batch)),
+            },
+        )
+        if data is None:
+            logger.warning("Bulk query for %s Q-identifiers failed." % len(batch))
+            continue
+        bindings = {q: [] for q in batch}
+        for b in data.get("results", {}).get("bindings"):
+            bindings.setdefault(b["item"]["value"].split("/")[-1], []).append(b)
+        for q, results in bindings.items():
+            inst_wikis[q] = __inst_from_bindings(q, results)
+    return inst_wikis
+
+
+def __inst_from_bindings(q, results):
+    inst_wiki = {
+        "name": [],
+        "headquarters": [],
+        "administrativeTerritorialEntity": [],
+        "locationOfFormation": [],
+        "inception": [],
+        "QID": q,
     }
-    reply = requests.get(MEDIAWIKI_API_URL, params=params)
-    reply.raise_for_status()
-    search_results = reply.json()
+    for b in results:
+        if "itemLabel" in b:
+            inst_wiki["name"] = b["itemLabel"]["value"]
+        if "headquartersLabel" in b:
+            inst_wiki["headquarters"].append(b["headquartersLabel"]["value"])
+        if "administrativeTerritorialEntityLabel" in b:
+            inst_wiki["administrativeTerritorialEntity"].append(
+                b["administrativeTerritorialEntityLabel"]["value"]
+            )
+        if "locationOfFormationLabel" in b:
+            inst_wiki["locationOfFormation"].append(
+                b["locationOfFormationLabel"]["value"]
+            )
+        if "inceptionLabel" in b:
+            inst_wiki["inception"].append(b["inceptionLabel"]["value"])
+    return inst_wiki
+
 
+def get_QID_inst(lookup, place=None, start=None, k=TOP_K):
+    """
+    Look up an institution name on Wikidata.
+    :param lookup: the institution name
+    :param place: the place the institution should be related to, optional
+    :param start: the year the institution should be founded in, optional
+    :param k: the number of candidates to compare with `place` and `start`
+    :return: a list with one {"id": ..., "label": ...}, or None if nothing is found. Without `place` and `start` it
+    is the first search hit, otherwise the one of the top-k hits which matches most of them.
+    """
+    return get_QID_inst_by_names([lookup], [place], [start], k)
+
+
+def get_QID_inst_by_names(lookups, places=(), starts=(), k=TOP_K):
+    """
+    Look up one institution by all of its names, e.g. the names of all its language rows, and pick one item for all
+    of them.
+    :param lookups: the names of the institution
+    :param places: the places the institution should be related to
+    :param starts: the years the institution should be founded in
+    :param k: the number of candidates per name to compare with `places` and `starts`
+    :return: a list with one {"id": ..., "label": ...}, or None if nothing is found, as `get_QID_inst` returns it
+    """
     results = []
-    if search_results["success"] != 1:
-        return None
-    else:
-        for i in search_results["search"]:
-            results.append({"id": i["id"], "label": i["label"]})
+    for lookup in dict.fromkeys(lookups):
+        for r in get_QIDs(lookup, k) or []:
+            if r["id"] not in [x["id"] for x in results]:
+                results.append(r)
     if len(results) == 0:
         return None
-    else:
-        return results[
-            0:1
-        ]  # Return the first Qid. In the future, to increase the accuracy of match, just rewrite
-        # this line to allow more QIDs to be returned for comparing.
+    places = [p for p in places if p]
+    starts = [s for s in starts if s]
+    if (not places and not starts) or len(results) == 1:
+        return results[0:1]
+    # Fetch the properties of all candidates at once and score them locally
+    inst_wikis = sparql_insts([r["id"] for r in results])
+    scores = [__score_inst(inst_wikis.get(r["id"]), places, starts) for r in results]
+    return [results[scores.index(max(scores))]]  # the first one wins a tie
+
+
+def __score_inst(inst_wiki, places, starts):
+    if inst_wiki is None:
+        return 0
+    score = 0
+    for p in [
+        "headquarters",
+        "administrativeTerritorialEntity",
+        "locationOfFormation",
+    ]:
+        if any(place in inst_wiki[p] for place in places):
+            score += 1
+    if any(
+        str(start)[0:4] == i[0:4] for start in starts for i in inst_wiki["inception"]
+    ):
+        score += 1
+    return score
 
 
 if __name__ == "__main__":
     inst_dict = read_institution_csv()
     print(inst_dict)
-    no_match, match = compare_inst(inst_dict, 10)
+    no_match, match = compare_inst(inst_dict)
     print("no_match dictionary: ", no_match)
     print("length of the no_match dictionary: ", len(no_match))
 
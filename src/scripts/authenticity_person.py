@@ -8,32 +8,31 @@ Strategy:
 
 """
 import json
-import time
+import logging
+import re
 from itertools import islice
+from urllib.parse import unquote
 
-import pandas as pd
-import requests
-
+from src.scripts import http_client, readact_snapshot, wikidata_api
 from src.scripts.authenticity_space import read_space_csv
 
 URL = "https://query.wikidata.org/sparql"
-QUERY = """
-        SELECT ?person ?personLabel ?ybirth ?ydeath ?birthplaceLabel ?genderLabel
+QUERY_BY_NAMES = """
+        SELECT DISTINCT ?lookup ?person ?personLabel ?ybirth ?ydeath ?birthplaceLabel ?genderLabel
         WHERE {{ 
+        VALUES (?lookup ?label ?alt) {{ {} }}
         {{?person wdt:P31 wd:Q5 ;
-                rdfs:label "{}"@{} . }} UNION {{?person wdt:P31 wd:Q5 ;
-                skos:altLabel "{}"@{} . }}
+                rdfs:label ?label . }} UNION {{?person wdt:P31 wd:Q5 ;
+                skos:altLabel ?alt . }}
         OPTIONAL {{ ?person  wdt:P21  ?gender . }}
         OPTIONAL {{ ?person  wdt:P569  ?birth . BIND(year(?birth) as ?ybirth) }}
         OPTIONAL {{ ?person  wdt:P570  ?death . BIND(year(?death) as ?ydeath) }}
         OPTIONAL {{ ?person wdt:P19  ?birthplace . }}
-        OPTIONAL {{ ?person skos:altLabel ?altLabel . }}
         
         SERVICE wikibase:label {{ bd:serviceParam wikibase:language  "[AUTO_LANGUAGE], en"}}
         }}
-        GROUP BY ?person ?personLabel ?ybirth ?ydeath ?birthplaceLabel ?genderLabel
-        LIMIT 250
         """
+NAME_BATCH_SIZE = 50  # number of (name, language) pairs sent in one VALUES clause
 
 QUERY_WITH_QID = """
 SELECT ?person ?personLabel ?ybirth ?ydeath ?birthplaceLabel ?genderLabel
@@ -50,6 +49,24 @@ WHERE {{
 LIMIT 1
 """
 
+QUERY_WITH_QIDS = """
+SELECT ?person ?personLabel ?ybirth ?ydeath ?birthplaceLabel ?genderLabel
+WHERE {{ 
+  values ?person {{ {} }}
+        OPTIONAL {{ ?person  wdt:P21  ?gender . }}
+        OPTIONAL {{ ?person  wdt:P569  ?birth . BIND(year(?birth) as ?ybirth) }}
+        OPTIONAL {{ ?person  wdt:P570  ?death . BIND(year(?death) as ?ydeath) }}
+        OPTIONAL {{ ?person wdt:P19  ?birthplace . }}
+
+        SERVICE wikibase:label {{ bd:serviceParam wikibase:language  "[AUTO_LANGUAGE], en"}}
+        }}
+"""
+QID_BATCH_SIZE = 100  # number of Q-identifiers sent in one VALUES clause
+WIKIPEDIA_LINK = r"//([a-z\-]+)\.(?:m\.)?wikipedia\.org/wiki/([^#?]+)"
+WIKIPEDIA_BATCH_SIZE = 50  # the maximum number of titles in one MediaWiki API request
+
+logger = logging.getLogger(__name__)
+
 
 #################################################################
 ################## Approach 1 : look up with name ##################
@@ -61,7 +78,7 @@ def read_person_csv(
     :param person_url
     :return: a dictionary
     """
-    df = pd.read_csv(person_url).fillna("")
+    df = readact_snapshot.read_csv(person_url).fillna("")
     person_dict = {}
     place_dict = read_space_csv()
     for index, row in df.iterrows():
@@ -171,13 +188,11 @@ def __clean_birth_death_year_format(default_year):
     # return years
 
 
-def get_person_weight(person_dict, sleep=2):
-    person_weight_dict = {}
+def get_person_weight(person_dict):
+    # Collect the names of all the persons first, so that they can be looked up together
+    lookups = {}
     for person_id, value in person_dict.items():
-        languages = value.keys()
-        l = []
-        person_weight_dict[person_id] = []
-        for lang in languages:
+        for lang in value.keys():
             v = value[lang]
             # Use the ordered_name list as lookups
             lookup_names = v[0]
@@ -187,7 +202,20 @@ def get_person_weight(person_dict, sleep=2):
                 lookup_names.append(v[4])
 
             if lookup_names != ["anonymous"] and lookup_names != ["无名"]:
-                person = sparql_by_name(lookup_names, lang, sleep)
+                lookups[(person_id, lang)] = lookup_names
+    found = sparql_by_names(
+        [(name, lang) for (_, lang), names in lookups.items() for name in names]
+    )
+
+    person_weight_dict = {}
+    for person_id, value in person_dict.items():
+        languages = value.keys()
+        l = []
+        person_weight_dict[person_id] = []
+        for lang in languages:
+            v = value[lang]
+            if (person_id, lang) in lookups:
+                person = merge_by_name(found, lookups[(person_id, lang)], lang)
             else:
                 continue
 
@@ -231,53 +259,110 @@ def get_person_weight(person_dict, sleep=2):
     return person_weight_dict
 
 
-def sparql_by_name(lookup_names, lang, sleep=2):
+def sparql_by_name(lookup_names, lang):
     if len(lookup_names) == 0:
         return None
+    found = sparql_by_names([(lookup, lang) for lookup in lookup_names])
+    return merge_by_name(found, lookup_names, lang)
+
+
+def sparql_by_names(lookups, batch_size=NAME_BATCH_SIZE):
+    """
+    Look up many names at once. The (name, language) pairs, which can come from many rows, are put into the VALUES
+    clause of one SPARQL query, and each result is mapped back to the pair which found it.
+    :param lookups: a list of (name, language) pairs, e.g. [("鲁迅", "zh"), ("Lu Xun", "en")]
+    :param batch_size: the number of pairs in one query
+    :return: a dictionary, key: (name, language), value: a dictionary of the found entities as `sparql_by_name`
+    returns it. Pairs whose query failed are not in the dictionary.
+    """
+    found = {}
+    lookups = list(
+        dict.fromkeys(
+            (name, lang)
+            for name, lang in lookups
+            if isinstance(name, str)
+            and len(name.strip()) > 0
+            and re.fullmatch(r"[a-zA-Z]+(-[a-zA-Z0-9]+)*", str(lang))
+        )
+    )
+    for i in range(0, len(lookups), batch_size):
+        batch = lookups[i : i + batch_size]
+        values = " ".join(
+            '("%s" %s@%s %s@%s)'
+            % (n, __sparql_string(name.strip()), lang, __sparql_string(name), lang)
+            for n, (name, lang) in enumerate(batch)
+        )
+        data = http_client.get_json(
+            URL,
+            params={"format": "json", "query": QUERY_BY_NAMES.format(values)},
+        )
+        if data is not None:  # a successful response
+            for pair in batch:
+                found[pair] = {}
+            results = data.get("results", {}).get("bindings")
+            for r in results:
+                person = found[batch[int(r["lookup"]["value"])]]
+                person_wiki = {}
+                # If this entity is not recorded in the person dictionary yet:
+                if r["person"]["value"][31:] not in person:
+                    if "person" in r:
+                        person_wiki["Q-id"] = r["person"]["value"][
+                            31:
+                        ]  # for example, 'Q558744'
+                    if "personLabel" in r:
+                        person_wiki["name"] = r["personLabel"]["value"]
+                    if "genderLabel" in r:
+                        person_wiki["gender"] = r["genderLabel"]["value"]
+                    if "ybirth" in r:
+                        person_wiki["birthyear"] = r["ybirth"]["value"]
+                    if "ydeath" in r:
+                        person_wiki["deathyear"] = r["ydeath"]["value"]
+                    if "birthplaceLabel" in r:
+                        person_wiki["birthplace"] = r["birthplaceLabel"]["value"]
+                    person[person_wiki["Q-id"]] = person_wiki
+        else:
+            logger.warning("Query for %s names failed." % len(batch))
+    return found
+
+
+def merge_by_name(found, lookup_names, lang):
+    """
+    Merge the entities found for each of the names of one person, in the order of the names.
+    :param found: the dictionary returned by `sparql_by_names`
+    :param lookup_names: the list of names of this person
+    :param lang: the language of these names
+    :return: a dictionary, key: Q-id, value: the information of this entity
+    """
+    return merge_by_names(found, [(lookup, lang) for lookup in lookup_names])
+
+
+def merge_by_names(found, lookups):
+    """
+    Merge the entities found for each of the (name, language) pairs of one person, e.g. the names of all its
+    language rows, in the order of the pairs.
+    :param found: the dictionary returned by `sparql_by_names`
+    :param lookups: the list of (name, language) pairs of this person
+    :return: a dictionary, key: Q-id, value: the information of this entity
+    """
     person = (
         {}
     )  # To collect entities which is found for the same person with different names
-    with requests.Session() as s:
-        for lookup in lookup_names:
-            # print("++++ For this name: \n", lookup)
-            response = s.get(
-                URL,
-                params={
-                    "format": "json",
-                    "query": QUERY.format(lookup.strip(), lang, lookup, lang),
-                },
-            )
-            if response.status_code == 200:  # a successful response
-                results = response.json().get("results", {}).get("bindings")
-                if len(results) == 0:
-                    # Didn't find the entity with this name on Wikidata
-                    continue
-                else:
-                    for r in results:
-                        person_wiki = {}
-                        # If this entity is not recorded in the person dictionary yet:
-                        if r["person"]["value"][31:] not in person:
-                            if "person" in r:
-                                person_wiki["Q-id"] = r["person"]["value"][
-                                    31:
-                                ]  # for example, 'Q558744'
-                            if "personLabel" in r:
-                                person_wiki["name"] = r["personLabel"]["value"]
-                            if "genderLabel" in r:
-                                person_wiki["gender"] = r["genderLabel"]["value"]
-                            if "ybirth" in r:
-                                person_wiki["birthyear"] = r["ybirth"]["value"]
-                            if "ydeath" in r:
-                                person_wiki["deathyear"] = r["ydeath"]["value"]
-                            if "birthplaceLabel" in r:
-                                person_wiki["birthplace"] = r["birthplaceLabel"][
-                                    "value"
-                                ]
-                            person[person_wiki["Q-id"]] = person_wiki
-            time.sleep(sleep)
+    for lookup in lookups:
+        for Qid, person_wiki in found.get(lookup, {}).items():
+            if Qid not in person:
+                person[Qid] = person_wiki
     return person
 
 
+def __sparql_string(s):
+    return '"%s"' % (
+        s.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
 def compare_weights(person_weight_dict):
     no_match_person = []
     match_person = {}
@@ -332,85 +417,171 @@ def chunks(person_dict, SIZE=30):
 def get_matched_by_wikipedia_url(
     person_url="https://raw.githubusercontent.com/readchina/ReadAct/master/csv/data/Person.csv",
 ):
-    df = pd.read_csv(person_url)
+    df = readact_snapshot.read_csv(person_url)
+    rows = df[["person_id", "source_1", "source_2"]].to_dict("records")
+
+    # Resolve the Wikipedia links of all rows at once
+    links = [wikipedia_link(row) for row in rows]
+    Qids_by_link = get_Qids_from_wikipedia_titles([link for link in links if link])
+    # key: person_id, value: the found Q-identifiers, in the order of the rows
+    candidates = {}
+    for row, link in zip(rows, links):
+        Qid = Qids_by_link.get(link)
+        if Qid is not None:
+            candidates.setdefault(row["person_id"], [])
+            if Qid not in candidates[row["person_id"]]:
+                candidates[row["person_id"]].append(Qid)
+
+    # and fetch the properties of all found persons at once
+    persons = sparql_with_Qids([q for Qids in candidates.values() for q in Qids])
     person_matched_by_wikipedia = {}
-
-    count = 0
-    for index, row in df.iterrows():
-        id = row["person_id"]
-        print(index, id)
-        if id not in person_matched_by_wikipedia:
-            Qid = get_Qid_from_wikipedia_url(row)
-            # print("Qid: ", Qid)
-            if Qid is not None:
-                count += 1
-                if count == 10:
-                    time.sleep(90)
-                    count = 0
-                wiki = sparql_with_Qid(Qid)
-                if len(wiki) > 0:
-                    person_matched_by_wikipedia[id] = [Qid, wiki]
+    for id, Qids in candidates.items():
+        for Qid in Qids:
+            wiki = persons[Qid] if Qid in persons else sparql_with_Qid(Qid)
+            if wiki:
+                person_matched_by_wikipedia[id] = [Qid, wiki]
+                break
     return person_matched_by_wikipedia
 
 
 def get_Qid_from_wikipedia_url(row):
-    # link: the wikipedia link in Person.csv
-    if isinstance(row["source_1"], str) and ".wikipedia.org/wiki/" in row["source_1"]:
-        link = row["source_1"]
-    elif isinstance(row["source_2"], str) and ".wikipedia.org/wiki/" in row["source_2"]:
-        link = row["source_2"]
-    else:
+    link = wikipedia_link(row)
+    if link is None:
         return None
-    if len(link) > 30:
-        language = link[8:10]
-        name = link[30:]
-        # Use MediaWiki API to query
-        url = (
-            "https://"
-            + language
-            + ".wikipedia.org/w/api.php?action=query&prop=pageprops&titles="
-            + name
-            + "&format=json"
-        )
-        response = requests.get(url).json()
-        if "pageprops" in list(response["query"]["pages"].values())[0]:
-            pageprops = list(response["query"]["pages"].values())[0]["pageprops"]
-            if "wikibase_item" in pageprops:
-                Qid = list(response["query"]["pages"].values())[0]["pageprops"][
-                    "wikibase_item"
-                ]
-                return Qid
+    return get_Qids_from_wikipedia_titles([link]).get(link)
+
+
+def wikipedia_link(row):
+    """
+    :param row: a row of Person.csv
+    :return: (language, title) of the Wikipedia link in `source_1` or `source_2`, or None
+    """
+    for source in ["source_1", "source_2"]:
+        if isinstance(row[source], str):
+            match = re.search(WIKIPEDIA_LINK, row[source])
+            if match:
+                return match.group(1), unquote(match.group(2)).replace("_", " ")
+    return None
+
+
+def get_Qids_from_wikipedia_titles(links, batch_size=WIKIPEDIA_BATCH_SIZE):
+    """
+    Resolve Wikipedia pages to Q-identifiers with the pageprops of the MediaWiki API. The titles are grouped by
+    language edition and sent `batch_size` at a time; normalized titles and redirects are followed.
+    :param links: a list of (language, title)
+    :param batch_size: the number of titles in one request
+    :return: a dictionary, key: (language, title), value: Q-identifier. Pages without Wikidata item are not in it.
+    """
+    titles_by_language = {}
+    for language, title in dict.fromkeys(links):
+        titles_by_language.setdefault(language, []).append(title)
+    Qids = {}
+    for language, titles in titles_by_language.items():
+        for i in range(0, len(titles), batch_size):
+            batch = titles[i : i + batch_size]
+            data = http_client.get_json(
+                "https://" + language + ".wikipedia.org/w/api.php",
+                params={
+                    "action": "query",
+                    "prop": "pageprops",
+                    "ppprop": "wikibase_item",
+                    "redirects": 1,
+                    "titles": "|".join(batch),
+                    "format": "json",
+                },
+            )
+            if data is None or "query" not in data:
+                logger.warning(
+                    "Wikipedia query for %s titles in %s failed."
+                    % (len(batch), language)
+                )
+                continue
+            query = data["query"]
+            normalized = {n["from"]: n["to"] for n in query.get("normalized", [])}
+            redirects = {r["from"]: r["to"] for r in query.get("redirects", [])}
+            Qid_by_title = {
+                page["title"]: page["pageprops"]["wikibase_item"]
+                for page in query.get("pages", {}).values()
+                if "wikibase_item" in page.get("pageprops", {})
+            }
+            for title in batch:
+                resolved = normalized.get(title, title)
+                resolved = redirects.get(resolved, resolved)
+                if resolved in Qid_by_title:
+                    Qids[(language, title)] = Qid_by_title[resolved]
+    return Qids
 
 
 def sparql_with_Qid(Qid):
+    if wikidata_api.enabled():
+        return wikidata_api.get_persons([Qid]).get(Qid, {})
     wiki_dict = {}
-    with requests.Session() as s:
-        response = s.get(
-            URL, params={"format": "json", "query": QUERY_WITH_QID.format(Qid)}
+    data = http_client.get_json(
+        URL, params={"format": "json", "query": QUERY_WITH_QID.format(Qid)}
+    )
+    if data is not None:  # a successful response
+        results = data.get("results", {}).get("bindings")
+        if len(results) == 0:
+            print(
+                "Didn't find the entity with this Q-identifier \"",
+                Qid,
+                '" on Wikidata',
+            )
+            return None
+        else:
+            for r in results:
+                if r is not None:
+                    wiki_dict = __person_from_binding(r, Qid)
+    return wiki_dict
+
+
+def sparql_with_Qids(Qids, batch_size=QID_BATCH_SIZE):
+    """
+    The bulk version of `sparql_with_Qid`: many Q-identifiers are put into the VALUES clause of one SPARQL query.
+    :param Qids: a list of Q-identifiers, e.g. ["Q23114", "Q5673"]
+    :param batch_size: the number of Q-identifiers in one query
+    :return: a dictionary, key: Q-identifier, value: the same dictionary as returned by `sparql_with_Qid`, or an empty
+    dictionary if the Q-identifier has no data on Wikidata. Q-identifiers whose query failed are not in the
+    dictionary.
+    """
+    if wikidata_api.enabled():
+        return wikidata_api.get_persons(Qids)
+    persons = {}
+    Qids = list(dict.fromkeys(q for q in Qids if re.fullmatch(r"Q\d+", str(q))))
+    for i in range(0, len(Qids), batch_size):
+        batch = Qids[i : i + batch_size]
+        data = http_client.get_json(
+            URL,
+            params={
+                "format": "json",
+                "query": QUERY_WITH_QIDS.format(" ".join("wd:" + q for q in batch)),
+            },
         )
-        if response.status_code == 200:  # a successful response
-            results = response.json().get("results", {}).get("bindings")
-            if len(results) == 0:
-                print(
-                    "Didn't find the entity with this Q-identifier \"",
-                    Qid,
-                    '" on Wikidata',
-                )
-                return None
-            else:
-                for r in results:
-                    if r is not None:
-                        wiki_dict["Q-id"] = Qid
-                        if "personLabel" in r:
-                            wiki_dict["name"] = r["personLabel"]["value"]
-                        if "genderLabel" in r:
-                            wiki_dict["gender"] = r["genderLabel"]["value"]
-                        if "ybirth" in r:
-                            wiki_dict["birthyear"] = r["ybirth"]["value"]
-                        if "ydeath" in r:
-                            wiki_dict["deathyear"] = r["ydeath"]["value"]
-                        if "birthplaceLabel" in r:
-                            wiki_dict["birthplace"] = r["birthplaceLabel"]["value"]
+        if data is None:
+            logger.warning("Bulk query for %s Q-identifiers failed." % len(batch))
+            continue
+        results = data.get("results", {}).get("bindings")
+        for q in batch:
+            persons[q] = {}
+        for r in results:
+            Qid = r["person"]["value"][31:]
+            if not persons.get(Qid):  # keep the first binding, like LIMIT 1
+                persons[Qid] = __person_from_binding(r, Qid)
+    return persons
+
+
+def __person_from_binding(r, Qid):
+    wiki_dict = {"Q-id": Qid}
+    if "personLabel" in r:
+        wiki_dict["name"] = r["personLabel"]["value"]
+    if "genderLabel" in r:
+        wiki_dict["gender"] = r["genderLabel"]["value"]
+    if "ybirth" in r:
+        wiki_dict["birthyear"] = r["ybirth"]["value"]
+    if "ydeath" in r:
+        wiki_dict["deathyear"] = r["ydeath"]["value"]
+    if "birthplaceLabel" in r:
+        wiki_dict["birthplace"] = r["birthplaceLabel"]["value"]
     return wiki_dict
 
 
@@ -425,14 +596,14 @@ if __name__ == "__main__":
         "https://raw.githubusercontent.com/readchina/ReadAct/master/csv/data/Person.csv"
     )
 
-    # Break the entire dictionary into several chunks.
-    # So that we can add break sessions in between to avoid exceed the limitation of SPARQL query
+    # Break the entire dictionary into several chunks, so that intermediate results are printed.
+    # The request rate is controlled by `rate_limiter`.
     no_match_by_name = []
     matched_by_name = {}
     for chunk in chunks(person_dict, 30):  # the digit here controls the batch size
         if len(chunk) > 0:
             print("chunk: \n", chunk)
-            person_weight_dict = get_person_weight(chunk, 2)
+            person_weight_dict = get_person_weight(chunk)
             no_match, person_match_dict = compare_weights(person_weight_dict)
             if len(no_match) > 0:
                 no_match_by_name = [*no_match_by_name, *no_match]
@@ -446,11 +617,6 @@ if __name__ == "__main__":
             print("\n===========================\n")
             print("Current final no match: ", no_match_by_name)
             print("Current final person_match_dict: ", matched_by_name)
-            print("\n I am taking a break XD \n")
-
-            time.sleep(
-                90
-            )  # for every a few person entries, let this script take a break of 90 seconds
 
     print("I finished all the iteration.")
     print("\n===========================\n")
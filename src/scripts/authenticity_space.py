@@ -15,24 +15,23 @@ less or equal to 0.9.
 
 import json
 import logging
+import re
 import sys
-import time
 from itertools import islice
 
-import pandas as pd
-import requests
+from src.scripts import http_client, readact_snapshot, wikidata_api
 
 URL = "https://query.wikidata.org/sparql"
 MEDIAWIKI_API_URL = "https://www.wikidata.org/w/api.php"
 QUERY_COORDINATE = """
 SELECT DISTINCT ?item ?coordinate
 WHERE {{
-  values ?item {{ wd:{} }}
+  values ?item {{ {} }}
   OPTIONAL {{ ?item  wdt:P625  ?coordinate . }}
-
-  SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
 }}
 """
+COORDINATE_BATCH_SIZE = 200  # number of Q-identifiers sent in one VALUES clause
+TOP_K = 5  # number of search hits compared with the known data
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +44,7 @@ def read_space_csv(
     :param space_url
     :return: a dictionary
     """
-    df = pd.read_csv(space_url)
+    df = readact_snapshot.read_csv(space_url)
     geo_code_dict = {}
     for index, row in df.iterrows():
         # consider the case that if there are identical space_id in csv file
@@ -89,7 +88,7 @@ def query_with_OSM(k, v):
             + long
             + "&zoom=18&addressdetails=1&format=json&accept-language=en"
         )
-        data = requests.get(url)
+        data = http_client.get(url)
         if v[0].lower() not in str(data.json()).lower():
             item = v + [k]
             return item
@@ -103,25 +102,21 @@ def geo_code_compare(no_match_list):
     """
     still_no_match_list = []
     space_with_QID = {}  # To collect QIDs for Space.csv
-    count = 0
-    for i in no_match_list:  # i: space_name, space_type, lat, long, space_id
-        if i[0] is None:
-            res = None
-        else:
-            count += 1
-            res = get_QID(
-                i[0]
-            )  # If there are more than one returned QID and we want to check all of them,
-            # the following code must be modified as well.
-
-        if count == 20:
-            time.sleep(30)
-            count = 0
-
+    # For each entry, the search hit nearest to its coordinate
+    found = [None if i[0] is None else get_QID(i[0], i[2], i[3]) for i in no_match_list]
+    # Fetch the coordinates of all found QIDs at once
+    coordinates = get_coordinates_from_wikidata(
+        [res["id"] for res in found if res is not None]
+    )
+    for i, res in zip(
+        no_match_list, found
+    ):  # i: space_name, space_type, lat, long, space_id
         if res is None:
             still_no_match_list.append(i)
         else:
-            coordinate_list = get_coordinate_from_wikidata(res["id"])
+            coordinate_list = coordinates.get(res["id"])
+            if coordinate_list is None:  # the bulk query failed
+                coordinate_list = get_coordinate_from_wikidata(res["id"])
             # if no coordinate_list, collect item into list, break nested loop
             if len(coordinate_list) == 0:
                 still_no_match_list.append(i)
@@ -148,7 +143,40 @@ def compare_coordinates_with_threhold(coordinate_wiki, lat_usr, long_usr, thresh
     return False
 
 
-def get_QID(lookup):
+def get_QID(lookup, lat=None, long=None, k=TOP_K):
+    """
+    Look up a space name on Wikidata.
+    :param lookup: the space name
+    :param lat: the latitude the space should have, optional
+    :param long: the longitude the space should have, optional
+    :param k: the number of candidates to compare with `lat` and `long`
+    :return: {"id": ..., "label": ...}, or None if nothing is found. Without `lat` and `long` it is the first search
+    hit, otherwise the one of the top-k hits whose coordinate is the nearest.
+    """
+    results = get_QIDs(lookup, k)
+    if not results:
+        return None
+    try:
+        lat, long = float(lat), float(long)
+    except (TypeError, ValueError):
+        return results[0]
+    if len(results) == 1:
+        return results[0]
+    # Fetch the coordinates of all candidates at once and score them locally
+    coordinates = get_coordinates_from_wikidata([r["id"] for r in results])
+    return min(
+        results,
+        key=lambda r: __coordinate_distance(coordinates.get(r["id"], []), lat, long),
+    )  # the first one wins a tie
+
+
+def get_QIDs(lookup, k=TOP_K):
+    """
+    :param lookup: a name
+    :param k: the maximum number of hits
+    :return: a list of the top-k `wbsearchentities` hits, each {"id": ..., "label": ...}, None if nothing is found,
+    or an empty list if the search failed
+    """
     params = {
         "action": "wbsearchentities",
         "language": "en",
@@ -156,10 +184,12 @@ def get_QID(lookup):
         "format": "json",
         "limit": 10,
     }
-    reply = requests.get(MEDIAWIKI_API_URL, params=params)
-    reply.raise_for_status()
-    search_results = reply.json()
+    search_results = http_client.get_json(
+        MEDIAWIKI_API_URL, params=params, raise_for_status=True
+    )
     results = []
+    if search_results is None:
+        return results
     if search_results["success"] != 1:
         return None
     else:
@@ -167,42 +197,65 @@ def get_QID(lookup):
             results.append({"id": i["id"], "label": i["label"]})
     if len(results) == 0:
         return None
-    else:
-        # Note(QG): this can be easily extended into a longer list to increase the possibility of matching. Only
-        # return the first one now due to efficiency.
-        return results[0]
+    return results[:k]
+
+
+def __coordinate_distance(coordinate_list, lat, long):
+    distances = []
+    for coordinate in coordinate_list:
+        try:  # the query-returned coordinate have order: long, lat
+            distances.append(
+                max(abs(float(coordinate[0]) - long), abs(float(coordinate[1]) - lat))
+            )
+        except (IndexError, ValueError):
+            continue
+    return min(distances, default=float("inf"))
 
 
 def get_coordinate_from_wikidata(q):
     """
     A function to extract coordinate location (if exists) of a wikidata entity
     :param qname: a wikidata id
-    :return: a list with tuples, each tuple is a (lat, long) combination
+    :return: a list with lists, each is a [long, lat] combination
+    """
+    return get_coordinates_from_wikidata([q]).get(q, [])
+
+
+def get_coordinates_from_wikidata(Qids, batch_size=COORDINATE_BATCH_SIZE):
+    """
+    The bulk version of `get_coordinate_from_wikidata`: many Q-identifiers are put into the VALUES clause of one
+    SPARQL query.
+    :param Qids: a list of wikidata ids
+    :param batch_size: the number of Q-identifiers in one query
+    :return: a dictionary, key: wikidata id, value: the same list as returned by `get_coordinate_from_wikidata`.
+    Q-identifiers whose query failed are not in the dictionary.
     """
-    coordinate_list = []
-    headers = {"User-Agent": "wikidatalookup/1.0.0"}
-    with requests.Session() as s:
-        response = s.get(
+    if wikidata_api.enabled():
+        return wikidata_api.get_coordinates(Qids)
+    coordinates = {}
+    Qids = list(dict.fromkeys(q for q in Qids if re.fullmatch(r"Q\d+", str(q))))
+    for i in range(0, len(Qids), batch_size):
+        batch = Qids[i : i + batch_size]
+        data = http_client.get_json(
             URL,
             params={
                 "format": "json",
-                "query": QUERY_COORDINATE.format(q),
+                "query": QUERY_COORDINATE.format(" ".join("wd:" + q for q in batch)),
             },
-            headers=headers,
         )
-        if response.status_code == 200:  # a successful response
-            results = response.json().get("results", {}).get("bindings")
-            if len(results) == 0:
-                pass
-            else:
-                for r in results:
-                    # If this entity is not recorded in this space_wiki dictionary yet:
-                    if "coordinate" in r:
-                        if "value" in r["coordinate"]:
-                            c = r["coordinate"]["value"][6:-1].split()
-                            # for example, '[114.158611111,22.278333333]'
-                            coordinate_list.append(c)
-    return coordinate_list
+        if data is None:
+            logger.warning("Coordinate query for %s Q-identifiers failed." % len(batch))
+            continue
+        for q in batch:
+            coordinates[q] = []
+        for r in data.get("results", {}).get("bindings"):
+            Qid = r["item"]["value"].split("/")[-1]
+            if "coordinate" in r and "value" in r["coordinate"]:
+                # for example, 'Point(114.158611111 22.278333333)'
+                coordinates.setdefault(Qid, []).append(
+                    r["coordinate"]["value"][6:-1].split()
+                )
+    return coordinates
 
 
 def chunks(it, size):
@@ -269,11 +322,6 @@ if __name__ == "__main__":
                 all_still_no_match_list += l
             dictionary_list += [d]
 
-            print("\n I am taking a break XD \n")
-            time.sleep(
-                10
-            )  # for every a few  entries, let this script take a break of 90 seconds
-
     print("Finished the whole iteration")
     print("all_still_no_match_list:", all_still_no_match_list)
     print("dictionary_list", dictionary_list)
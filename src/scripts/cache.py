@@ -0,0 +1,235 @@
+"""
+A persistent on-disk cache for the JSON answers of Wikidata (SPARQL endpoint and MediaWiki API).
+
+Entries are stored in a SQLite database, keyed by the endpoint and the normalized query parameters. Answers with a
+match are kept for `ttl` seconds, answers without any match ("negative" entries) only for `negative_ttl` seconds, so
+that items created on Wikidata in the meantime are found by the next run. When the database holds more than
+`max_entries` entries, the least recently used ones are evicted, down to 90% of `max_entries`.
+
+Reading an entry does not write to the database: the time it was used is kept in memory and written together with the
+next stored answer. Several processes can share the database, e.g. with `--workers`, so the entries are counted again
+before any are evicted.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "readactor",
+    "wikidata.sqlite",
+)
+DEFAULT_TTL = 30 * 24 * 3600  # 30 days
+DEFAULT_NEGATIVE_TTL = 24 * 3600  # 1 day
+DEFAULT_MAX_ENTRIES = 100000
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    "path": DEFAULT_PATH,
+    "ttl": DEFAULT_TTL,
+    "negative_ttl": DEFAULT_NEGATIVE_TTL,
+    "max_entries": DEFAULT_MAX_ENTRIES,
+    "enabled": True,
+    "refresh": False,
+}
+_connection = None
+# the number of entries in the database, counted when it is opened and again before evicting, since other processes
+# can store entries too
+_count = {"entries": 0}
+# key: the time the entry was last read, not written to the database yet
+_accessed = {}
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    """
+    Change the settings of the cache, e.g. `configure(enabled=False)`.
+    :param path: the SQLite file
+    :param ttl: seconds to keep an answer with a match
+    :param negative_ttl: seconds to keep an answer without any match
+    :param max_entries: the maximum number of entries before the least recently used ones are evicted
+    :param enabled: False to neither read nor write the cache
+    :param refresh: True to ignore the cached answers but store the new ones
+    """
+    global _connection
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError("Unknown cache settings: %s" % ", ".join(sorted(unknown)))
+    with _lock:
+        if "path" in settings and _connection is not None:
+            _flush(_connection)
+            _connection.commit()
+            _connection.close()
+            _connection = None
+        _settings.update(settings)
+
+
+def settings():
+    """
+    :return: a copy of the current settings, e.g. to configure a worker process the same way
+    """
+    return dict(_settings)
+
+
+def reset():
+    """
+    Forget the connection to the database without closing it, e.g. in a worker process which inherited it from its
+    parent: a SQLite connection must not be used across `fork()`. The next access opens a new one.
+    """
+    global _connection, _lock
+    _connection = None
+    _accessed.clear()
+    _lock = threading.Lock()
+
+
+def make_key(url, params):
+    """
+    Build the cache key of a request. Whitespace in SPARQL queries is collapsed and parameters are sorted, so that
+    the same query formatted differently shares one entry.
+    """
+    normalized = {
+        k: " ".join(str(v).split()) if k == "query" else str(v)
+        for k, v in (params or {}).items()
+    }
+    text = url + "?" + json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_negative(data):
+    """
+    An answer is negative if it has no match: an empty list of SPARQL bindings or of `wbsearchentities` results, only
+    missing items of `wbgetentities`, or only missing pages of a MediaWiki `query`.
+    """
+    if not isinstance(data, dict):
+        return False
+    if "results" in data:
+        return len(data["results"].get("bindings", [])) == 0
+    if "search" in data:
+        return len(data["search"]) == 0
+    if "entities" in data:
+        return all("missing" in entity for entity in data["entities"].values())
+    if "query" in data and "pages" in data["query"]:
+        return all("missing" in page for page in data["query"]["pages"].values())
+    return False
+
+
+def get(url, params):
+    """
+    :return: the cached answer, or None if there is no valid entry
+    """
+    if not _settings["enabled"] or _settings["refresh"]:
+        return None
+    key = make_key(url, params)
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        entry = connection.execute(
+            "SELECT body, expires FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if entry is None:
+            return None
+        if entry[1] < now:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            connection.commit()
+            _count["entries"] -= 1
+            return None
+        _accessed[key] = now
+    return json.loads(entry[0])
+
+
+def put(url, params, data):
+    """
+    Store an answer, with the short `negative_ttl` if it has no match.
+    """
+    if not _settings["enabled"]:
+        return
+    negative = is_negative(data)
+    now = time.time()
+    expires = now + (_settings["negative_ttl"] if negative else _settings["ttl"])
+    key = make_key(url, params)
+    with _lock:
+        connection = _connect()
+        if (
+            connection.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            is None
+        ):
+            _count["entries"] += 1
+        connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                url,
+                json.dumps(data, ensure_ascii=False),
+                int(negative),
+                expires,
+                now,
+            ),
+        )
+        _flush(connection)
+        if _count["entries"] > _settings["max_entries"]:
+            _evict(connection)
+        connection.commit()
+
+
+def clear():
+    """
+    Delete all entries.
+    """
+    with _lock:
+        connection = _connect()
+        connection.execute("DELETE FROM responses")
+        connection.commit()
+        _count["entries"] = 0
+        _accessed.clear()
+
+
+def _flush(connection):
+    # write the times the entries were read since the last write
+    connection.executemany(
+        "UPDATE responses SET accessed = ? WHERE key = ?",
+        [(accessed, key) for key, accessed in _accessed.items()],
+    )
+    _accessed.clear()
+
+
+def _evict(connection):
+    # the least recently used entries, down to 90% of `max_entries`
+    _count["entries"] = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[
+        0
+    ]
+    if _count["entries"] <= _settings["max_entries"]:
+        return
+    keep = _settings["max_entries"] - _settings["max_entries"] // 10
+    connection.execute(
+        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+        (_count["entries"] - keep,),
+    )
+    _count["entries"] = keep
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        directory = os.path.dirname(_settings["path"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _connection = sqlite3.connect(_settings["path"], check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT, body TEXT, "
+            "negative INTEGER, expires REAL, accessed REAL)"
+        )
+        _connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        _count["entries"] = _connection.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()[0]
+        logger.debug("Using the Wikidata cache at %s" % _settings["path"])
+    return _connection
@@ -0,0 +1,184 @@
+"""
+A process-wide HTTP client for all the requests ReadActor sends to Wikidata (SPARQL and MediaWiki API), Wikipedia and
+OpenStreetMap (Nominatim).
+
+One `requests.Session` per thread is shared by every lookup function, so that TCP/TLS connections are kept alive and
+reused between rows instead of being opened again for every single query. Sessions are not documented as thread-safe,
+so the threads of `check_rows` each get their own.
+
+Identical JSON requests are coalesced ("single-flight"): while a request is in flight, the same request from another
+thread waits for its answer instead of being sent again. Once the answer has landed, it is forgotten: answers are only
+kept across requests by the persistent cache (see `src.scripts.cache`).
+"""
+import logging
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.scripts import cache, rate_limiter
+
+USER_AGENT = "ReadActor (https://github.com/readchina/ReadActor)"
+TIMEOUT = (10, 60)  # (connect, read) in seconds
+POOL_CONNECTIONS = 10  # number of hosts to keep a connection pool for
+POOL_MAXSIZE = 16  # number of connections kept alive per host
+RETRY_STATUS = (429, 503)  # the server asks us to slow down
+MAX_RETRIES = 5
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()  # the session of each thread
+_sessions = weakref.WeakSet()  # the sessions of the living threads, to close them
+_sessions_lock = threading.Lock()
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    """
+    One request in flight, and its answer once it has landed.
+    """
+
+    def __init__(self):
+        self.landed = threading.Event()
+        self.data = None
+        self.error = None
+
+
+def get_session():
+    """
+    Return the session of this thread, create it on first use.
+    :return: a requests.Session with keep-alive connection pools mounted for http and https
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+        )
+        _local.session = session
+        with _sessions_lock:
+            _sessions.add(session)
+    return session
+
+
+def close_session():
+    """
+    Close the pooled connections of all threads. A new session will be created by the next request.
+    """
+    global _local
+    with _sessions_lock:
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
+        _local = threading.local()
+
+
+def reset():
+    """
+    Forget the sessions and the requests in flight without closing the connections, e.g. in a worker process which
+    inherited them from its parent. The next request creates a new session.
+    """
+    global _local, _sessions, _sessions_lock, _flights_lock
+    _local = threading.local()
+    _sessions = weakref.WeakSet()
+    _sessions_lock = threading.Lock()
+    _flights.clear()
+    _flights_lock = threading.Lock()
+
+
+def get(url, params=None, headers=None, timeout=TIMEOUT):
+    """
+    Send a GET request through the session of this thread. Requests wait for the rate limiter of the host, and are sent
+    again (at most `MAX_RETRIES` times) when the host answers that it is overloaded.
+    :param url: the URL to query
+    :param params: a dictionary of query parameters
+    :param headers: extra headers for this request only
+    :param timeout: (connect, read) timeout in seconds
+    :return: a requests.Response
+    """
+    bucket = rate_limiter.get_bucket(url)
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        logger.debug("GET %s" % url)
+        response = get_session().get(
+            url, params=params, headers=headers, timeout=timeout
+        )
+        if response.status_code not in RETRY_STATUS:
+            bucket.speed_up()
+            return response
+        retry_after = rate_limiter.parse_retry_after(
+            response.headers.get("Retry-After")
+        )
+        logger.warning(
+            "%s answered with status %s, slowing down (Retry-After: %s)."
+            % (url, response.status_code, retry_after)
+        )
+        bucket.slow_down(retry_after)
+    return response
+
+
+def get_json(url, params=None, use_cache=True, raise_for_status=False):
+    """
+    Send a GET request through the shared session and decode the JSON answer. Answers are read from and stored in the
+    persistent cache (see `src.scripts.cache`) unless `use_cache` is False. Identical requests sent at the same time
+    share one request and its answer, so the returned JSON must not be modified.
+    :param url: the URL to query
+    :param params: a dictionary of query parameters
+    :param use_cache: False to always send the request
+    :param raise_for_status: True to raise `requests.HTTPError` for an unsuccessful response instead of returning None
+    :return: the decoded JSON, or None if the response is not successful
+    """
+    if not use_cache:
+        return _fetch_json(url, params, use_cache, raise_for_status)
+    key = (cache.make_key(url, params), raise_for_status)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.landed.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.data
+    try:
+        flight.data = _fetch_json(url, params, use_cache, raise_for_status)
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.landed.set()
+    return flight.data
+
+
+def clear_flights():
+    """
+    Forget the requests in flight, e.g. between tests.
+    """
+    with _flights_lock:
+        _flights.clear()
+
+
+def _fetch_json(url, params, use_cache, raise_for_status):
+    if use_cache:
+        data = cache.get(url, params)
+        if data is not None:
+            return data
+    response = get(url, params=params)
+    if raise_for_status:
+        response.raise_for_status()
+    if response.status_code != 200:  # not a successful response
+        return None
+    data = response.json()
+    if use_cache:
+        cache.put(url, params, data)
+    return data
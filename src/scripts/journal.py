@@ -0,0 +1,149 @@
+"""
+An append-only journal of the checked rows, so that an aborted run can be continued.
+
+While a table is checked, the outcome of each row is appended to a JSONL file next to the input table as soon as the
+row is done, e.g. `Person.journal.jsonl` for `Person.csv`. If the run aborts (a conflict ends it with `sys.exit()`,
+Ctrl-C, a lost connection), the rows checked so far are not lost: a run with `--resume` replays them from the journal
+and only checks the rest. A row is only replayed if it is unchanged in the input table, so a row which has been fixed
+after a conflict is checked again. The journal is removed when a run completes.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# records: the rows of the journal to resume from, written: the keys of the rows already appended by `record`
+_journal = {"path": None, "file": None, "records": {}, "written": set()}
+_lock = threading.Lock()
+
+
+def journal_path(path):
+    """
+    :param path: the path of the input table, e.g. "Person.csv", or of a directory of tables
+    :return: the path of its journal, e.g. "Person.journal.jsonl", or "ReadActor.journal.jsonl" in the directory
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, "ReadActor.journal.jsonl")
+    return os.path.splitext(path)[0] + ".journal.jsonl"
+
+
+def start(path, resume=False):
+    """
+    Start journaling the checked rows to `path`.
+    :param path: the JSONL file
+    :param resume: True to replay the rows in an existing journal, False to start a new one
+    """
+    finish(remove=False)
+    records = {}
+    if resume and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # the last line of an aborted run can be incomplete
+                records[record["key"]] = record["row"]
+        logger.info("Resuming from %s rows in the journal %s" % (len(records), path))
+    elif resume:
+        logger.warning("There is no journal at %s to resume from." % path)
+    with _lock:
+        _journal["path"] = path
+        _journal["records"] = records
+        _journal["written"] = set()
+        _journal["file"] = open(path, "a" if resume else "w", encoding="utf-8")
+
+
+def finish(remove=True):
+    """
+    Stop journaling.
+    :param remove: True to delete the journal, e.g. when the run has completed
+    """
+    with _lock:
+        if _journal["file"] is not None:
+            _journal["file"].close()
+            if remove and os.path.isfile(_journal["path"]):
+                os.remove(_journal["path"])
+        _journal["path"] = None
+        _journal["file"] = None
+        _journal["records"] = {}
+        _journal["written"] = set()
+
+
+def pending(entity_type, df):
+    """
+    :return: the rows of `df` which are not in the journal yet and still have to be checked
+    """
+    if not _journal["records"]:
+        return df
+    mask = [
+        _key(entity_type, index, row) not in _journal["records"]
+        for index, row in df.iterrows()
+    ]
+    return df.loc[mask]
+
+
+def replay(entity_type, check):
+    """
+    Wrap the check of a row: rows in the journal are taken from it instead of being checked again, the other rows
+    are checked and appended to the journal.
+    :param entity_type: "Person", "Institution" or "Space"
+    :param check: a function `check(index, row)` which returns the checked row
+    :return: a function with the same signature as `check`
+    """
+    if _journal["file"] is None:
+        return check
+
+    def journaled_check(index, row):
+        key = _key(entity_type, index, row)
+        if key in _journal["records"]:
+            return pd.Series(_journal["records"][key], index=row.index, name=row.name)
+        checked = check(index, row)
+        if key not in _journal["written"]:
+            _append(key, checked)
+        return checked
+
+    return journaled_check
+
+
+def record(entity_type, index, row, checked):
+    """
+    Append a row checked elsewhere, e.g. in a worker process of `check_in_processes`, to the journal before it is
+    passed through `replay`, which then does not append it again.
+    :param entity_type: "Person", "Institution" or "Space"
+    :param index: the index of the row in the input table
+    :param row: the row in the input table
+    :param checked: the checked row
+    """
+    if _journal["file"] is None:
+        return
+    key = _key(entity_type, index, row)
+    _append(key, checked)
+    _journal["written"].add(key)
+
+
+def _append(key, checked):
+    line = json.dumps(
+        {"key": key, "row": checked.tolist()}, ensure_ascii=False, default=_plain
+    )
+    with _lock:
+        _journal["file"].write(line + "\n")
+        _journal["file"].flush()
+
+
+def _key(entity_type, index, row):
+    text = json.dumps(
+        [entity_type, str(index)] + [str(v) for v in row.tolist()], ensure_ascii=False
+    )
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _plain(value):
+    # numpy scalars, e.g. numpy.int64
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -0,0 +1,160 @@
+"""
+A manifest of the rows which have been verified, for incremental runs.
+
+When a table is checked with `--incremental`, a hash of each verified row is stored in a manifest next to the table,
+e.g. `Person.manifest.json` for `Person.csv`, together with the versions of everything the rows were verified
+against: the ReadAct tables (see `readact_snapshot.version`) and ReadActor itself. On the next incremental run, a
+row whose content is the same as a verified row is not checked again. If any of these versions changed, all rows are
+checked again.
+
+A verified row stays verified until it changes: e.g. a person without match in Wikidata is not looked up again, even
+if Wikidata has an item for it in the meantime. Run without `--incremental` from time to time to check all rows.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version as package_version
+
+from src.scripts import readact_snapshot
+from src.scripts.agent_table_processing import (
+    AGENT_GITHUB,
+    INST_GITHUB,
+    PERSON_GITHUB,
+    SPACE_GITHUB,
+)
+
+# entity type: the ReadAct tables its rows are verified against
+READACT_TABLES = {
+    "Person": [PERSON_GITHUB, AGENT_GITHUB, SPACE_GITHUB],
+    "Institution": [INST_GITHUB, AGENT_GITHUB, SPACE_GITHUB],
+    "Space": [SPACE_GITHUB],
+}
+
+logger = logging.getLogger(__name__)
+
+# entity type: {"path", "dependencies", "verified": hashes of the last run, "checked": hashes of this run}
+_manifests = {}
+_lock = threading.Lock()
+
+
+def manifest_path(path):
+    """
+    :param path: the path of the input table, e.g. "Person.csv"
+    :return: the path of its manifest, e.g. "Person.manifest.json"
+    """
+    return os.path.splitext(path)[0] + ".manifest.json"
+
+
+def dependencies(entity_type):
+    """
+    :return: a dictionary of the versions the rows of `entity_type` are verified against
+    """
+    try:
+        readactor_version = package_version("ReadActor")
+    except PackageNotFoundError:
+        readactor_version = None
+    versions = {"ReadActor": readactor_version}
+    for url in READACT_TABLES[entity_type]:
+        versions[url] = readact_snapshot.version(url)
+    return versions
+
+
+def start(entity_type, path, dependencies):
+    """
+    Start an incremental run of a table: read the rows verified by the last run, if they were verified against the
+    same `dependencies`.
+    :param entity_type: "Person", "Institution" or "Space"
+    :param path: the manifest file
+    :param dependencies: the result of `dependencies(entity_type)`
+    """
+    verified = set()
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("dependencies") == dependencies:
+            verified = set(manifest.get("rows", []))
+            logger.info(
+                "%s rows of %s were verified by the last run."
+                % (len(verified), entity_type)
+            )
+        else:
+            logger.info(
+                "ReadAct or ReadActor changed since the last run, checking all rows of %s."
+                % entity_type
+            )
+    with _lock:
+        _manifests[entity_type] = {
+            "path": path,
+            "dependencies": dependencies,
+            "verified": verified,
+            "checked": set(),
+        }
+
+
+def finish():
+    """
+    Write the rows verified in this run to the manifests and stop the incremental run.
+    """
+    with _lock:
+        for manifest in _manifests.values():
+            with open(manifest["path"] + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "dependencies": manifest["dependencies"],
+                        "rows": sorted(manifest["checked"]),
+                    },
+                    f,
+                )
+            os.replace(manifest["path"] + ".tmp", manifest["path"])
+        _manifests.clear()
+
+
+def unverified(entity_type, df):
+    """
+    :return: the rows of `df` which are not verified yet and have to be checked
+    """
+    if entity_type not in _manifests or not _manifests[entity_type]["verified"]:
+        return df
+    verified = _manifests[entity_type]["verified"]
+    mask = [row_hash(entity_type, row) not in verified for _, row in df.iterrows()]
+    return df.loc[mask]
+
+
+def skip_verified(entity_type, check):
+    """
+    Wrap the check of a row: verified rows are returned as they are, the other rows are checked. Both are verified
+    rows for the next run.
+    :param entity_type: "Person", "Institution" or "Space"
+    :param check: a function `check(index, row)` which returns the checked row
+    :return: a function with the same signature as `check`
+    """
+    if entity_type not in _manifests:
+        return check
+    manifest = _manifests[entity_type]
+
+    def incremental_check(index, row):
+        key = row_hash(entity_type, row)
+        if key in manifest["verified"]:
+            logger.info("Row %s is unchanged since the last run. Pass " % index)
+            checked = row
+        else:
+            checked = check(index, row)
+            key = row_hash(entity_type, checked)
+        with _lock:
+            manifest["checked"].add(key)
+        return checked
+
+    return incremental_check
+
+
+def row_hash(entity_type, row):
+    """
+    :return: a hash of the content of a row, independent of its position in the table
+    """
+    text = json.dumps(
+        [entity_type] + [[str(c), str(v)] for c, v in row.items()], ensure_ascii=False
+    )
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
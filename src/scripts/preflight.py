@@ -0,0 +1,131 @@
+"""
+A preflight check of a user table against ReadAct, before anything is queried on Wikidata.
+
+Some conflicts abort the checks of the rows (`check_each_row_Person`, `check_each_row_Inst`, `check_each_row_Space`),
+although they only depend on the tables themselves. They are looked for in the whole table at once, with set and join
+operations, and all of them are reported together, instead of one at a time in the middle of a run:
+
+1. a row without ID,
+2. an ID which is not unique (Space), or an (inst_id, inst_name) pair which is not unique (Institution),
+3. an ID in ReadAct with a different `wikidata_id` than in ReadAct, or without a ReadAct row in its language,
+4. an ID not in ReadAct with a `wikidata_id` which is in ReadAct under another ID.
+
+Rows with "skip" in `note` are not checked, exactly like the checks of the rows skip them.
+"""
+import logging
+import sys
+
+import pandas as pd
+
+ID_COLUMNS = {"Person": "person_id", "Institution": "inst_id", "Space": "space_id"}
+
+logger = logging.getLogger(__name__)
+
+
+def find_conflicts(df, entity_type, df_gh, ids_gh, wikidata_ids_gh):
+    """
+    :param df: the user table
+    :param entity_type: "Person", "Institution" or "Space"
+    :param df_gh: the same table in ReadAct
+    :param ids_gh: all the IDs in ReadAct
+    :param wikidata_ids_gh: all the `wikidata_id` in ReadAct
+    :return: a list of error messages, empty if there is no conflict
+    """
+    id_column = ID_COLUMNS[entity_type]
+    ids = df[id_column].fillna("").astype(str)
+    wikidata_ids = df["wikidata_id"].fillna("").astype(str)
+    notes = df["note"].fillna("").astype(str)
+    if (
+        entity_type == "Space"
+    ):  # `check_each_row_Space` strips `note`, the other checks compare it as it is
+        notes = notes.str.strip()
+    checked = ~notes.isin(["skip", "Skip"])
+    conflicts = []
+
+    for index in df.index[checked & (ids.str.len() == 0)]:
+        conflicts.append("Row %s has no `%s`." % (index, id_column))
+
+    if entity_type == "Space":
+        duplicated = df[id_column].duplicated(keep=False)
+        for space_id in dict.fromkeys(df.loc[duplicated, id_column]):
+            conflicts.append("The space_id %s is not unique." % space_id)
+    elif entity_type == "Institution":
+        duplicated = df.duplicated(["inst_id", "inst_name"], keep=False)
+        for inst_id, inst_name in dict.fromkeys(
+            zip(df.loc[duplicated, "inst_id"], df.loc[duplicated, "inst_name"])
+        ):
+            conflicts.append(
+                "The (inst_id, inst_name) pair (%s, %s) is not unique."
+                % (inst_id, inst_name)
+            )
+
+    # IDs in ReadAct: compare with the first ReadAct row of the same ID and language
+    in_readact = checked & (ids.str.len() > 0) & ids.isin(ids_gh)
+    rows_gh = df_gh[[id_column, "language", "wikidata_id"]].drop_duplicates(
+        [id_column, "language"]
+    )
+    joined = pd.merge(
+        pd.DataFrame(
+            {
+                "index": df.index[in_readact],
+                id_column: ids[in_readact].to_numpy(),
+                "language": df.loc[in_readact, "language"].to_numpy(),
+                "wikidata_id": wikidata_ids[in_readact].to_numpy(),
+            }
+        ),
+        rows_gh,
+        on=[id_column, "language"],
+        how="left",
+        suffixes=("", "_gh"),
+        indicator=True,
+    )
+    missing_language = joined["_merge"] == "left_only"
+    wikidata_ids_differ = ~missing_language & (
+        joined["wikidata_id"] != joined["wikidata_id_gh"].fillna("")
+    )
+    if entity_type == "Space":  # a Space without wikidata_id in ReadAct passes
+        wikidata_ids_differ &= joined["wikidata_id_gh"].fillna("").str.len() > 0
+    for index, entity_id, language in joined.loc[
+        missing_language, ["index", id_column, "language"]
+    ].itertuples(index=False):
+        conflicts.append(
+            "Row %s : `%s` %s is in ReadAct, but not in language %s."
+            % (index, id_column, entity_id, language)
+        )
+    for index, entity_id in joined.loc[
+        wikidata_ids_differ, ["index", id_column]
+    ].itertuples(index=False):
+        conflicts.append(
+            "Row %s : `wikidata_id` does not match the one of %s in ReadAct."
+            % (index, entity_id)
+        )
+
+    # IDs not in ReadAct: their wikidata_id must not be in ReadAct either
+    taken = (
+        checked
+        & (ids.str.len() > 0)
+        & ~ids.isin(ids_gh)
+        & (wikidata_ids.str.len() > 0)
+        & wikidata_ids.isin(wikidata_ids_gh)
+    )
+    for index in df.index[taken]:
+        conflicts.append(
+            "Row %s : `wikidata_id` %s is in ReadAct, but `%s` %s is not."
+            % (index, wikidata_ids[index], id_column, ids[index])
+        )
+    return conflicts
+
+
+def preflight(df, entity_type, df_gh, ids_gh, wikidata_ids_gh):
+    """
+    Report all the conflicts found by `find_conflicts` and stop if there is any.
+    """
+    conflicts = find_conflicts(df, entity_type, df_gh, ids_gh, wikidata_ids_gh)
+    for conflict in conflicts:
+        logger.error(conflict)
+    if conflicts:
+        logger.error(
+            "%s conflict(s) in your %s table. Please check them before running ReadActor again."
+            % (len(conflicts), entity_type)
+        )
+        sys.exit()
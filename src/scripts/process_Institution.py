@@ -1,3 +1,4 @@
+import functools
 import logging
 import re
 import sys
@@ -5,8 +6,16 @@ from datetime import date
 
 import pandas as pd
 
-from src.scripts.agent_table_processing import process_agent_tables
-from src.scripts.authenticity_institution import get_QID_inst, sparql_inst
+from src.scripts import journal, manifest
+from src.scripts.async_engine import check_in_processes, check_rows, write_rows
+from src.scripts.authenticity_institution import (
+    get_QID_inst,
+    get_QID_inst_by_names,
+    sparql_inst,
+    sparql_insts,
+)
+from src.scripts.preflight import preflight
+from src.scripts.readact_index import ReadActIndex
 
 logger = logging.getLogger(__name__)
 
@@ -18,49 +27,159 @@ def modify_note_lastModified_lastModifiedBy(row, message, today):
     return row
 
 
-def process_Inst(df, entity_type):
-    # Check if (inst_id, inst_name) pairs are unique in user file
-    id_name_pairs = []
-    for pair in zip(df["inst_id"], df["inst_name"]):
-        pair_str = "({})".format(",".join(pair))
-        id_name_pairs.append(pair_str)
-    if len(id_name_pairs) > len(set(id_name_pairs)):
-        logger.error(
-            "Error: (inst_id, inst_name) in your Institution table are not unique."
-        )
-        sys.exit()
-
+def process_Inst(df, entity_type, concurrency=1, readact_index=None, workers=1):
+    if readact_index is None:
+        readact_index = ReadActIndex()
     # Process the local Agent table
     (
         df_P_or_I_gh,
         agent_processed,
-        all_agents_ids_gh,
+        _,
         last_inst_id,
-        all_wikidata_ids,
         _,
         _,
-    ) = process_agent_tables(entity_type, "ReadAct", path=[])
-    # Process local table row by row
+        _,
+    ) = readact_index.agent_tables(entity_type)
+    all_agents_ids_gh = readact_index.agent_ids
+    all_wikidata_ids = readact_index.wikidata_ids
+    # Report all the conflicts which need no Wikidata query at once, e.g. (inst_id, inst_name) pairs which are not
+    # unique
+    preflight(df, entity_type, df_P_or_I_gh, all_agents_ids_gh, all_wikidata_ids)
+
+    # Look up the names of all institutions without `wikidata_id` first, all language rows of an institution
+    # together and `concurrency` institutions at the same time
+    # (only the rows which are not in the journal of an aborted run yet, and not verified by the last incremental
+    # run)
+    df_pending = manifest.unverified(entity_type, journal.pending(entity_type, df))
+    insts_by_name = prefetch_insts_by_name(df_pending, all_agents_ids_gh, concurrency)
+    # and then fetch the properties of all user-provided and found `wikidata_id` at once
+    insts_by_qid = prefetch_insts_by_qid(
+        df_pending, all_agents_ids_gh, all_wikidata_ids, insts_by_name
+    )
+
+    # Process local table row by row, `concurrency` rows at the same time
     print("~~~~~~~~~~~~~")
     print("df:", df)
     print("~~~~~~~~~~~~~")
     print("df_P_or_I_gh:", df_P_or_I_gh)
     print("~~~~~~~~~~~~~")
-    for index, row in df.iterrows():
-        print("-------------\nFor row ", index + 2, " :")
-        print(row.tolist())
-        row, last_inst_id = check_each_row_Inst(
-            index, row, df_P_or_I_gh, all_agents_ids_gh, last_inst_id, all_wikidata_ids
+
+    context = (
+        df_P_or_I_gh,
+        all_agents_ids_gh,
+        last_inst_id,
+        all_wikidata_ids,
+        readact_index,
+        insts_by_qid,
+        insts_by_name,
+    )
+    check = functools.partial(check_row_Inst, context=context)
+    if workers > 1:
+        # in `workers` processes, all language rows of an institution in the same one
+        check = check_in_processes(
+            df_pending,
+            "inst_id",
+            check_row_Inst,
+            context,
+            workers,
+            concurrency,
+            on_checked=functools.partial(journal.record, entity_type),
         )
-        # make the format of start and end (year) valid
-        row = format_year_Inst(row)
-        df.loc[index] = row
+
+    # Write the changed cells back column by column
+    write_rows(
+        df,
+        check_rows(
+            df.iterrows(),
+            journal.replay(entity_type, manifest.skip_verified(entity_type, check)),
+            concurrency,
+        ),
+    )
     return df
 
 
+def check_row_Inst(index, row, context):
+    """
+    Check a row with `check_each_row_Inst` and make the format of start and end (year) valid.
+    :param context: the arguments of `check_each_row_Inst` after `row`
+    :return: the checked row
+    """
+    print("-------------\nFor row ", index + 2, " :")
+    print(row.tolist())
+    row, _ = check_each_row_Inst(index, row, *context)
+    return format_year_Inst(row)
+
+
+def prefetch_insts_by_name(df, all_agents_ids_gh, concurrency=1):
+    """
+    Resolve the institutions which will be looked up by name in `check_each_row_Inst` (not skipped, `inst_id` not in
+    ReadAct, no `wikidata_id`) once per `inst_id`: the names, places and starts of all language rows of an
+    institution are looked up together, and every language row gets the same verdict. An institution with a
+    `wikidata_id` in another language row is resolved to that `wikidata_id`.
+    :return: a dictionary, key: inst_id, value: the result of `get_QID_inst` for all names of this institution
+    """
+    mask = (
+        ~df["note"].isin(["skip", "Skip"])
+        & (df["inst_id"].astype(str).str.len() > 0)
+        & ~df["inst_id"].isin(all_agents_ids_gh)
+    )
+    lookups = {}
+    q_ids = {}
+    for inst_id, inst_name, place, start, wikidata_id in zip(
+        df.loc[mask, "inst_id"],
+        df.loc[mask, "inst_name"],
+        df.loc[mask, "place"],
+        df.loc[mask, "start"],
+        df.loc[mask, "wikidata_id"],
+    ):
+        if isinstance(wikidata_id, str) and len(wikidata_id) > 0:
+            q_ids.setdefault(inst_id, [{"id": wikidata_id, "label": inst_name}])
+        elif isinstance(inst_name, str) and len(inst_name) > 0:
+            names, places, starts = lookups.setdefault(inst_id, ([], [], []))
+            names.append(inst_name)
+            places.append(place)
+            starts.append(start)
+    insts_by_name = {inst_id: q_ids[inst_id] for inst_id in lookups if inst_id in q_ids}
+    keys = [inst_id for inst_id in lookups if inst_id not in q_ids]
+    results = check_rows(
+        enumerate(keys),
+        lambda i, inst_id: get_QID_inst_by_names(*lookups[inst_id]),
+        concurrency,
+    )
+    insts_by_name.update(zip(keys, results))
+    return insts_by_name
+
+
+def prefetch_insts_by_qid(df, all_agents_ids_gh, all_wikidata_ids, insts_by_name):
+    """
+    Collect the `wikidata_id` whose properties will be queried by `check_each_row_Inst`: the ones given by the user
+    (not skipped, `inst_id` not in ReadAct) and the ones found by name, which are not in ReadAct. Query them in bulk.
+    :return: a dictionary, key: wikidata_id, value: the result of `sparql_inst` for it
+    """
+    mask = ~df["note"].isin(["skip", "Skip"]) & ~df["inst_id"].isin(all_agents_ids_gh)
+    q_ids = [q for q in df.loc[mask, "wikidata_id"] if isinstance(q, str) and q]
+    q_ids += [results[0]["id"] for results in insts_by_name.values() if results]
+    q_ids = [q for q in q_ids if q not in all_wikidata_ids]
+    if len(q_ids) == 0:
+        return {}
+    return sparql_insts(q_ids)
+
+
 def check_each_row_Inst(
-    index, row, df_inst_gh, all_agents_ids_gh, last_inst_id, all_wikidata_ids
+    index,
+    row,
+    df_inst_gh,
+    all_agents_ids_gh,
+    last_inst_id,
+    all_wikidata_ids,
+    readact_index=None,
+    insts_by_qid=None,
+    insts_by_name=None,
 ):
+    if insts_by_qid is None:
+        insts_by_qid = {}
+    if insts_by_name is None:
+        insts_by_name = {}
     today = date.today().strftime("%Y-%m-%d")
     if row["note"] == "skip" or row["note"] == "Skip":
         return row, last_inst_id
@@ -68,7 +187,9 @@ def check_each_row_Inst(
         if isinstance(row["inst_id"], str) and len(row["inst_id"]) > 0:
             if row["inst_id"] in all_agents_ids_gh:  # inst_id is in ReadAct
                 return (
-                    __compare_wikidata_ids_Inst(index, row, df_inst_gh, today),
+                    __compare_wikidata_ids_Inst(
+                        index, row, df_inst_gh, today, readact_index
+                    ),
                     last_inst_id,
                 )
             else:  # inst_id not in ReadAct
@@ -84,9 +205,11 @@ def check_each_row_Inst(
                         )
                         sys.exit()
                     else:  # the input wikidata_id not in ReadAct
-                        inst_wiki = sparql_inst(
-                            [row["wikidata_id"]]
-                        )  # query by wikidata_id to get other properties
+                        # query by wikidata_id to get other properties
+                        if row["wikidata_id"] in insts_by_qid:
+                            inst_wiki = insts_by_qid[row["wikidata_id"]]
+                        else:
+                            inst_wiki = sparql_inst([row["wikidata_id"]])
 
                         print("===============")
                         print("inst_wiki:")
@@ -122,9 +245,13 @@ def check_each_row_Inst(
                     if row["inst_name"] is None or len(row["inst_name"]) == 0:
                         wikidata_id_from_query_Inst = None
                     else:
-                        wikidata_id_from_query_Inst = get_QID_inst(
-                            row["inst_name"]
-                        )  # only return one value
+                        # only return one value: the search hit which matches place and start best
+                        if row["inst_id"] in insts_by_name:
+                            wikidata_id_from_query_Inst = insts_by_name[row["inst_id"]]
+                        else:
+                            wikidata_id_from_query_Inst = get_QID_inst(
+                                row["inst_name"], row["place"], row["start"]
+                            )
                     if (
                         wikidata_id_from_query_Inst is None
                     ):  # query by name and return None
@@ -145,9 +272,15 @@ def check_each_row_Inst(
                         # The found wikidata_id is not in ReadAct, the next step is to compare the info given by
                         # Wikidata with start/end/place in Institution
                         else:
-                            inst_wiki = sparql_inst(
-                                [wikidata_id_from_query_Inst[0]["id"]]
-                            )  # query by wikidata_id to get other properties
+                            # query by wikidata_id to get other properties
+                            if wikidata_id_from_query_Inst[0]["id"] in insts_by_qid:
+                                inst_wiki = insts_by_qid[
+                                    wikidata_id_from_query_Inst[0]["id"]
+                                ]
+                            else:
+                                inst_wiki = sparql_inst(
+                                    [wikidata_id_from_query_Inst[0]["id"]]
+                                )
                             l = [
                                 inst_wiki["headquarters"],
                                 inst_wiki["administrativeTerritorialEntity"],
@@ -178,13 +311,16 @@ def check_each_row_Inst(
     return row, last_inst_id
 
 
-def __compare_wikidata_ids_Inst(index, row, df_inst_gh, today):
+def __compare_wikidata_ids_Inst(index, row, df_inst_gh, today, readact_index=None):
     wikidata_id_usr = row["wikidata_id"]
-    row_gh_index = df_inst_gh.index[
-        (df_inst_gh["inst_id"] == row["inst_id"])
-        & (df_inst_gh["language"] == row["language"])
-    ].tolist()[0]
-    row_GH = df_inst_gh.iloc[row_gh_index]
+    if readact_index is not None:
+        row_GH = readact_index.row("Institution", row["inst_id"], row["language"])
+    else:
+        row_gh_index = df_inst_gh.index[
+            (df_inst_gh["inst_id"] == row["inst_id"])
+            & (df_inst_gh["language"] == row["language"])
+        ].tolist()[0]
+        row_GH = df_inst_gh.iloc[row_gh_index]
     wikidata_id_gh = row_GH["wikidata_id"]
     if wikidata_id_gh == wikidata_id_usr:  # two wikidata_id are the same
         res = __compare_two_rows_Inst(row, row_GH)
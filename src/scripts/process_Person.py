@@ -1,13 +1,20 @@
+import functools
 import logging
 import sys
 from datetime import date
 
-from src.scripts.agent_table_processing import process_agent_tables
+from src.scripts import journal, manifest
+from src.scripts.async_engine import check_in_processes, check_rows, write_rows
 from src.scripts.authenticity_person import (
+    merge_by_names,
     order_name_by_language,
     sparql_by_name,
+    sparql_by_names,
     sparql_with_Qid,
+    sparql_with_Qids,
 )
+from src.scripts.preflight import preflight
+from src.scripts.readact_index import ReadActIndex
 
 logger = logging.getLogger(__name__)
 
@@ -19,34 +26,159 @@ logger = logging.getLogger(__name__)
 #     return row
 
 
-def process_Pers(df, entity_type):
+def process_Pers(df, entity_type, concurrency=1, readact_index=None, workers=1):
+    if readact_index is None:
+        readact_index = ReadActIndex()
     # Process the local Agent table
     (
         df_person_gh,
         agent_processed,
-        person_ids_gh,
+        _,
         last_person_id,
-        all_wikidata_ids,
         _,
         _,
-    ) = process_agent_tables(entity_type, "ReadAct", path=[])
+        _,
+    ) = readact_index.agent_tables(entity_type)
+    person_ids_gh = readact_index.agent_ids
+    all_wikidata_ids = readact_index.wikidata_ids
+    # Report all the conflicts which need no Wikidata query at once
+    preflight(df, entity_type, df_person_gh, person_ids_gh, all_wikidata_ids)
 
-    # Process local table row by row
-    for index, row in df.iterrows():
-        print("-------------\nFor row ", index + 2, " :")
-        print(row.tolist())
-        row, last_person_id = check_each_row_Person(
-            index, row, df_person_gh, person_ids_gh, last_person_id, all_wikidata_ids
+    # The rows which are not in the journal of an aborted run yet, and not verified by the last incremental run
+    df_pending = manifest.unverified(entity_type, journal.pending(entity_type, df))
+    # Fetch the Wikidata properties of all user-provided `wikidata_id` at once
+    persons_by_qid = prefetch_persons_by_qid(
+        df_pending, person_ids_gh, all_wikidata_ids
+    )
+    # Look up the names of all persons without `wikidata_id` at once, all language rows of a person together
+    persons_by_name = prefetch_persons_by_name(df_pending, person_ids_gh)
+    # and then fetch the properties of the first found entity for each of these rows
+    persons_by_qid.update(
+        sparql_with_Qids(
+            [
+                next(iter(person))
+                for person in persons_by_name.values()
+                if person and next(iter(person)) not in persons_by_qid
+            ]
+        )
+    )
+
+    # Process local table row by row, `concurrency` rows at the same time
+    context = (
+        df_person_gh,
+        person_ids_gh,
+        last_person_id,
+        all_wikidata_ids,
+        persons_by_qid,
+        persons_by_name,
+        readact_index,
+    )
+    check = functools.partial(check_row_Person, context=context)
+    if workers > 1:
+        # in `workers` processes, all language rows of a person in the same one
+        check = check_in_processes(
+            df_pending,
+            "person_id",
+            check_row_Person,
+            context,
+            workers,
+            concurrency,
+            on_checked=functools.partial(journal.record, entity_type),
         )
-        # make the format of birth and death year valid
-        row = format_year_Person(row)
-        df.loc[index] = row
+
+    # Write the changed cells back column by column
+    write_rows(
+        df,
+        check_rows(
+            df.iterrows(),
+            journal.replay(entity_type, manifest.skip_verified(entity_type, check)),
+            concurrency,
+        ),
+    )
     return df
 
 
+def prefetch_persons_by_qid(df, person_ids_gh, all_wikidata_ids):
+    """
+    Collect the `wikidata_id` of the rows which will be queried by `check_each_row_Person` (not skipped, `person_id`
+    not in ReadAct, `wikidata_id` not in ReadAct) and query them in bulk.
+    :return: a dictionary, key: wikidata_id, value: the result of `sparql_with_Qid` for it
+    """
+    mask = (
+        ~df["note"].isin(["skip", "Skip"])
+        & ~df["person_id"].isin(person_ids_gh)
+        & ~df["wikidata_id"].isin(all_wikidata_ids)
+    )
+    Qids = [q for q in df.loc[mask, "wikidata_id"] if isinstance(q, str) and q]
+    if len(Qids) == 0:
+        return {}
+    return sparql_with_Qids(Qids)
+
+
+def check_row_Person(index, row, context):
+    """
+    Check a row with `check_each_row_Person` and make the format of birth and death year valid.
+    :param context: the arguments of `check_each_row_Person` after `row`
+    :return: the checked row
+    """
+    print("-------------\nFor row ", index + 2, " :")
+    print(row.tolist())
+    row, _ = check_each_row_Person(index, row, *context)
+    return format_year_Person(row)
+
+
+def prefetch_persons_by_name(df, person_ids_gh):
+    """
+    Resolve the persons which will be looked up by name in `check_each_row_Person` (not skipped, `person_id` not in
+    ReadAct, no `wikidata_id`) once per `person_id`: the names of all language rows of a person are looked up
+    together with a few batched queries, and every language row gets the same verdict. A person with a `wikidata_id`
+    in another language row is resolved to that `wikidata_id`.
+    :return: a dictionary, key: person_id, value: the result of `sparql_by_name` for all names of this person
+    """
+    mask = (
+        ~df["note"].isin(["skip", "Skip"])
+        & ~df["person_id"].isin(person_ids_gh)
+        & (df["person_id"].astype(str).str.len() > 0)
+    )
+    lookups = {}
+    Qids = {}
+    for _, row in df.loc[mask].iterrows():
+        if isinstance(row["wikidata_id"], str) and len(row["wikidata_id"]) > 0:
+            Qids.setdefault(row["person_id"], row["wikidata_id"])
+        else:
+            lookups.setdefault(row["person_id"], []).extend(
+                (name, row["language"]) for name in order_name_by_language(row)
+            )
+    persons_by_name = {
+        person_id: {Qids[person_id]: {"Q-id": Qids[person_id]}}
+        for person_id in lookups
+        if person_id in Qids
+    }
+    lookups = {k: v for k, v in lookups.items() if k not in Qids}
+    if len(lookups) == 0:
+        return persons_by_name
+    found = sparql_by_names([pair for pairs in lookups.values() for pair in pairs])
+    for person_id, pairs in lookups.items():
+        if all(pair in found for pair in pairs):
+            persons_by_name[person_id] = merge_by_names(found, pairs)
+    return persons_by_name
+
+
 def check_each_row_Person(
-    index, row, df_person_gh, person_ids_gh, last_person_id, all_wikidata_ids
+    index,
+    row,
+    df_person_gh,
+    person_ids_gh,
+    last_person_id,
+    all_wikidata_ids,
+    persons_by_qid=None,
+    persons_by_name=None,
+    readact_index=None,
 ):
+    if persons_by_qid is None:
+        persons_by_qid = {}
+    if persons_by_name is None:
+        persons_by_name = {}
     today = date.today().strftime("%Y-%m-%d")
     if row["note"] == "skip" or row["note"] == "Skip":
         return row, last_person_id
@@ -54,7 +186,9 @@ def check_each_row_Person(
         if isinstance(row["person_id"], str) and len(row["person_id"]) > 0:
             if row["person_id"] in person_ids_gh:
                 return (
-                    __compare_wikidata_ids_Person(index, row, df_person_gh),
+                    __compare_wikidata_ids_Person(
+                        index, row, df_person_gh, readact_index
+                    ),
                     last_person_id,
                 )
             else:
@@ -78,7 +212,10 @@ def check_each_row_Person(
                         sys.exit()
                     else:
                         wikidata_id_usr = row["wikidata_id"]
-                        person_dict = sparql_with_Qid(wikidata_id_usr)
+                        if wikidata_id_usr in persons_by_qid:
+                            person_dict = persons_by_qid[wikidata_id_usr]
+                        else:
+                            person_dict = sparql_with_Qid(wikidata_id_usr)
                         note_flag = False
                         modified_fields = []
                         if (
@@ -127,8 +264,12 @@ def check_each_row_Person(
                             logger.info("Row %s is checked. Pass " % index)
                             return row, last_person_id
                 else:  # user provided "person_id" but not "wikidata_id"
-                    names = order_name_by_language(row)
-                    person = sparql_by_name(names, row["language"], 2)
+                    if row["person_id"] in persons_by_name:
+                        person = persons_by_name[row["person_id"]]
+                    else:
+                        person = sparql_by_name(
+                            order_name_by_language(row), row["language"]
+                        )
                     if len(person) > 0:
                         wikidata_id_usr = next(iter(person))
                         if wikidata_id_usr in all_wikidata_ids:
@@ -156,7 +297,10 @@ def check_each_row_Person(
                             sys.exit()
                         else:
                             row["wikidata_id"] = wikidata_id_usr
-                            person_dict = sparql_with_Qid(wikidata_id_usr)
+                            if wikidata_id_usr in persons_by_qid:
+                                person_dict = persons_by_qid[wikidata_id_usr]
+                            else:
+                                person_dict = sparql_with_Qid(wikidata_id_usr)
                             note_flag = False
                             modified_fields = ["wikidata_id"]
                             if (
@@ -322,13 +466,16 @@ def __overwrite_Person(row, row_gh):
     return row
 
 
-def __compare_wikidata_ids_Person(index, row, df_person_gh):
+def __compare_wikidata_ids_Person(index, row, df_person_gh, readact_index=None):
     wikidata_id_usr = row["wikidata_id"]
-    row_gh_index = df_person_gh.index[
-        (df_person_gh["person_id"] == row["person_id"])
-        & (df_person_gh["language"] == row["language"])
-    ].tolist()[0]
-    row_GH = df_person_gh.iloc[row_gh_index]
+    if readact_index is not None:
+        row_GH = readact_index.row("Person", row["person_id"], row["language"])
+    else:
+        row_gh_index = df_person_gh.index[
+            (df_person_gh["person_id"] == row["person_id"])
+            & (df_person_gh["language"] == row["language"])
+        ].tolist()[0]
+        row_GH = df_person_gh.iloc[row_gh_index]
     wikidata_id_gh = row_GH["wikidata_id"]
     if wikidata_id_gh == wikidata_id_usr:
         res = __compare_two_rows_Person(row, row_GH)
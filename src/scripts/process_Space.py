@@ -1,53 +1,117 @@
+import functools
 import logging
 import sys
 from datetime import date
 
-import pandas as pd
-
+from src.scripts import journal, manifest
+from src.scripts.async_engine import check_in_processes, check_rows, write_rows
 from src.scripts.authenticity_space import (
     compare_coordinates_with_threhold,
     get_coordinate_from_wikidata,
+    get_coordinates_from_wikidata,
     get_QID,
     query_with_OSM,
 )
-
-SPACE_GITHUB = (
-    "https://raw.githubusercontent.com/readchina/ReadAct/master/csv/data/Space.csv"
-)
+from src.scripts.preflight import preflight
+from src.scripts.readact_index import ReadActIndex
 
 logger = logging.getLogger(__name__)
 
 
-def process_Spac(df):
-    # Check if space_id are unique in user file
-    if not pd.Series(df["space_id"]).is_unique:
-        logger.error("Error: space IDs in your Space table are not unique.")
-        sys.exit()
-
-    # Read the Space table in ReadAct
-    df_space_gh = pd.read_csv(SPACE_GITHUB)
-    df_space_gh = df_space_gh.fillna("")  # Replace all the nan into empty string
+def process_Spac(df, concurrency=1, readact_index=None, workers=1):
+    if readact_index is None:
+        readact_index = ReadActIndex()
+    # The Space table in ReadAct
+    df_space_gh = readact_index.space_table()
     check_gh(df_space_gh)
-    space_ids_gh = df_space_gh["space_id"].tolist()
-    space_ids_gh.sort()
-    wikidata_ids_GH = df_space_gh["wikidata_id"].tolist()
-    last_space_id = space_ids_gh[-1]
-    # Process local table row by row
-    for index, row in df.iterrows():
-        print(
-            "-------------\nFor row ", index + 2, " :"
-        )  # Because the header line in Person.csv is already row 1
-        print(row.tolist())
-        row, last_space_id = check_each_row_Space(
-            index, row, df_space_gh, space_ids_gh, last_space_id, wikidata_ids_GH
+    space_ids_gh = readact_index.space_ids
+    wikidata_ids_GH = readact_index.space_wikidata_ids
+    last_space_id = readact_index.last_space_id
+    # Report all the conflicts which need no Wikidata query at once, e.g. space IDs which are not unique
+    preflight(df, "Space", df_space_gh, space_ids_gh, wikidata_ids_GH)
+    # Fetch the coordinates of all user-provided `wikidata_id` at once, except those of the rows which are in the
+    # journal of an aborted run already or verified by the last incremental run
+    df_pending = manifest.unverified("Space", journal.pending("Space", df))
+    coordinates = prefetch_coordinates(df_pending, space_ids_gh, wikidata_ids_GH)
+
+    # Process local table row by row, `concurrency` rows at the same time
+    context = (
+        df_space_gh,
+        space_ids_gh,
+        last_space_id,
+        wikidata_ids_GH,
+        readact_index,
+        coordinates,
+    )
+    check = functools.partial(check_row_Space, context=context)
+    if workers > 1:
+        # in `workers` processes
+        check = check_in_processes(
+            df_pending,
+            "space_id",
+            check_row_Space,
+            context,
+            workers,
+            concurrency,
+            on_checked=functools.partial(journal.record, "Space"),
         )
-        df.loc[index] = row
+
+    # Write the changed cells back column by column
+    write_rows(
+        df,
+        check_rows(
+            df.iterrows(),
+            journal.replay("Space", manifest.skip_verified("Space", check)),
+            concurrency,
+        ),
+    )
     return df
 
 
+def check_row_Space(index, row, context):
+    """
+    Check a row with `check_each_row_Space`.
+    :param context: the arguments of `check_each_row_Space` after `row`
+    :return: the checked row
+    """
+    print(
+        "-------------\nFor row ", index + 2, " :"
+    )  # Because the header line in Person.csv is already row 1
+    print(row.tolist())
+    row, _ = check_each_row_Space(index, row, *context)
+    return row
+
+
+def prefetch_coordinates(df, space_ids_gh, wikidata_ids_GH):
+    """
+    Collect the `wikidata_id` of the rows whose coordinates will be checked by `check_each_row_Space` (not skipped,
+    `space_id` not in ReadAct, `wikidata_id` not in ReadAct) and query them in bulk.
+    :return: a dictionary, key: wikidata_id, value: the result of `get_coordinate_from_wikidata` for it
+    """
+    mask = (
+        ~df["note"].astype(str).str.strip().isin(["skip", "Skip"])
+        & (df["space_id"].astype(str).str.len() > 0)
+        & ~df["space_id"].isin(space_ids_gh)
+        & ~df["wikidata_id"].isin(wikidata_ids_GH)
+    )
+    Qids = [q for q in df.loc[mask, "wikidata_id"] if isinstance(q, str) and q]
+    if len(Qids) == 0:
+        return {}
+    return get_coordinates_from_wikidata(Qids)
+
+
 def check_each_row_Space(
-    index, row, df_space_gh, space_ids_gh, last_space_id, wikidata_ids_GH
+    index,
+    row,
+    df_space_gh,
+    space_ids_gh,
+    last_space_id,
+    wikidata_ids_GH,
+    readact_index=None,
+    coordinates=None,
 ):
+    if coordinates is None:
+        coordinates = {}
     today = date.today().strftime("%Y-%m-%d")
     if (
         row["note"].strip() == "skip" or row["note"].strip() == "Skip"
@@ -59,7 +123,9 @@ def check_each_row_Space(
         ):  # user did input space_id
             if row["space_id"] in space_ids_gh:  # space_id in ReadAct
                 return (
-                    __compare_wikidata_ids_Space(index, row, df_space_gh, today),
+                    __compare_wikidata_ids_Space(
+                        index, row, df_space_gh, today, readact_index
+                    ),
                     last_space_id,
                 )
             else:  # space_id not in ReadAct
@@ -75,9 +141,12 @@ def check_each_row_Space(
                         )
                         sys.exit()
                     else:  # the input wikidata_id not in ReadAct
-                        coordinate_from_wikidata = get_coordinate_from_wikidata(
-                            row["wikidata_id"]
-                        )
+                        if row["wikidata_id"] in coordinates:
+                            coordinate_from_wikidata = coordinates[row["wikidata_id"]]
+                        else:
+                            coordinate_from_wikidata = get_coordinate_from_wikidata(
+                                row["wikidata_id"]
+                            )
                         if (
                             len(coordinate_from_wikidata) == 0
                         ):  # input wikidata_id has no P625
@@ -116,9 +185,11 @@ def check_each_row_Space(
                         )
                     else:  # res_OSM: space_name, space_type, lat, long, space_id
                         # ToDo(QG): no_match_list[0][0] should be equal to row['space_name]. Should check.
-                        wikidata_id_from_query = get_QID(
-                            res_OSM[0]
-                        )  # only return one value
+                        # the search hit nearest to the input coordinate
+                        query_space = get_QID(res_OSM[0], res_OSM[2], res_OSM[3])
+                        wikidata_id_from_query = (
+                            None if query_space is None else query_space["id"]
+                        )
                         if wikidata_id_from_query is None:  # query returns None
                             logger.info(
                                 "For row %s : check lat+long on OSM found the address which doesn't contain "
@@ -197,7 +268,7 @@ def modify_note_lastModified_lastModifiedBy(row, message, today):
     return row
 
 
-def __compare_wikidata_ids_Space(index, row, df_space_gh, today):
+def __compare_wikidata_ids_Space(index, row, df_space_gh, today, readact_index=None):
     """
     When user input wikidata_id and this wikidata_id already exists in ReadAct,
     compare the input row with the ReadAct row which has the same "sapce_id":
@@ -207,11 +278,14 @@ def __compare_wikidata_ids_Space(index, row, df_space_gh, today):
     3. if two wikidata ids are not identical, report error for mismatch.
     """
     wikidata_id_usr = row["wikidata_id"]
-    row_gh_index = df_space_gh.index[
-        (df_space_gh["space_id"] == row["space_id"])
-        & (df_space_gh["language"] == row["language"])
-    ].tolist()[0]
-    row_GH = df_space_gh.iloc[row_gh_index]
+    if readact_index is not None:
+        row_GH = readact_index.row("Space", row["space_id"], row["language"])
+    else:
+        row_gh_index = df_space_gh.index[
+            (df_space_gh["space_id"] == row["space_id"])
+            & (df_space_gh["language"] == row["language"])
+        ].tolist()[0]
+        row_GH = df_space_gh.iloc[row_gh_index]
     wikidata_id_gh = row_GH["wikidata_id"]
     if (
         wikidata_id_gh is None or len(wikidata_id_gh) == 0
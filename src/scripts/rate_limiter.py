@@ -0,0 +1,149 @@
+"""
+Per-endpoint rate limiting for the requests ReadActor sends.
+
+Each host gets a token bucket. A request takes one token and waits if there is none left. When a host answers with
+HTTP 429 (Too Many Requests) or 503, its rate is halved and no request is sent before the `Retry-After` time has
+passed. After a number of successful requests in a row, the rate is increased again, up to a maximum per host.
+
+The buckets only limit the requests of one process. When the rows are checked in N worker processes, each of them is
+configured with `configure(share=1 / N)`, so that all of them together stay within the rates of a single process.
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# host: (initial requests per second, maximum requests per second)
+RATES = {
+    "query.wikidata.org": (2.0, 5.0),
+    "www.wikidata.org": (5.0, 20.0),
+    "wikipedia.org": (5.0, 20.0),
+    # the usage policy of Nominatim allows at most 1 request per second
+    "nominatim.openstreetmap.org": (1.0, 1.0),
+    "raw.githubusercontent.com": (5.0, 20.0),
+}
+DEFAULT_RATE = (2.0, 10.0)
+MIN_RATE = 0.05  # one request every 20 seconds
+SPEED_UP_AFTER = 20  # successful requests in a row before the rate is increased
+SPEED_UP_FACTOR = 1.25
+
+_settings = {"share": 1.0}
+_buckets = {}
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    """
+    Change the settings of the rate limiter, e.g. `configure(share=0.25)`. The buckets are created again.
+    :param share: the part of the rate of each host this process may use
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(
+            "Unknown rate limiter settings: %s" % ", ".join(sorted(unknown))
+        )
+    with _lock:
+        _settings.update(settings)
+        _buckets.clear()
+
+
+def settings():
+    """
+    :return: a copy of the current settings, e.g. to configure a worker process the same way
+    """
+    return dict(_settings)
+
+
+class TokenBucket:
+    """
+    A token bucket which refills `rate` tokens per second and holds at most `capacity` tokens.
+    """
+
+    def __init__(self, rate, max_rate, capacity=None):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.successes = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, wait until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self, retry_after=None):
+        """
+        Halve the rate, and block all requests for `retry_after` seconds if given.
+        """
+        with self.lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0
+            self.successes = 0
+            if retry_after:
+                self.blocked_until = max(
+                    self.blocked_until, time.monotonic() + retry_after
+                )
+
+    def speed_up(self):
+        """
+        Count a successful request, increase the rate after `SPEED_UP_AFTER` of them in a row.
+        """
+        with self.lock:
+            self.successes += 1
+            if self.successes >= SPEED_UP_AFTER and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * SPEED_UP_FACTOR)
+                self.capacity = max(self.capacity, self.rate)
+                self.successes = 0
+
+
+def get_bucket(url):
+    """
+    :return: the token bucket of the host of `url`
+    """
+    host = urlparse(url).netloc
+    with _lock:
+        if host not in _buckets:
+            rate, max_rate = DEFAULT_RATE
+            for suffix, rates in RATES.items():
+                if host == suffix or host.endswith("." + suffix):
+                    rate, max_rate = rates
+                    break
+            _buckets[host] = TokenBucket(
+                rate * _settings["share"], max_rate * _settings["share"]
+            )
+        return _buckets[host]
+
+
+def parse_retry_after(value):
+    """
+    :param value: the value of a `Retry-After` header, either seconds or an HTTP date
+    :return: seconds to wait, or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,165 @@
+"""
+An in-memory index of the ReadAct tables, built once per run and shared by all processors.
+
+The checks of a row ask the same questions over and over: is this agent_id / space_id / wikidata_id in ReadAct, and
+which ReadAct row has this (id, language)? The index answers them with hash maps instead of scanning lists or masking
+whole dataframes. Each table and each map is only built the first time it is needed.
+"""
+import logging
+import threading
+
+from src.scripts import readact_snapshot, shared_frames
+from src.scripts.agent_table_processing import (
+    AGENT_GITHUB,
+    SPACE_GITHUB,
+    process_agent_tables,
+)
+
+ID_COLUMNS = {"Person": "person_id", "Institution": "inst_id", "Space": "space_id"}
+
+logger = logging.getLogger(__name__)
+
+
+class ReadActIndex:
+    """
+    Lazily built hash maps over the ReadAct tables:
+    `agent_ids`, `wikidata_ids`, `space_ids`, `space_wikidata_ids`, `space_names` and `row(entity_type, id, language)`.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # for the worker processes of `check_in_processes`: the maps built so far, without the lock, and the
+        # ReadAct tables as memory-mapped Arrow files if pyarrow is installed
+        with self._lock:
+            return {
+                key: shared_frames.share(value) for key, value in self._memo.items()
+            }
+
+    def __setstate__(self, memo):
+        self._memo = memo
+        self._lock = threading.RLock()
+
+    def _get(self, key, build):
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = build()
+            return self._memo[key]
+
+    def agent_tables(self, entity_type):
+        """
+        :return: the result of `process_agent_tables(entity_type, "ReadAct", path=[])`
+        """
+        return self._get(
+            ("agent_tables", entity_type),
+            lambda: process_agent_tables(entity_type, "ReadAct", path=[]),
+        )
+
+    def agent_table(self):
+        """
+        :return: the Agent table of ReadAct
+        """
+        return self._get(
+            "agent_table", lambda: readact_snapshot.read_csv(AGENT_GITHUB).fillna("")
+        )
+
+    def space_table(self):
+        """
+        :return: the Space table of ReadAct
+        """
+        return self._get(
+            "space_table", lambda: readact_snapshot.read_csv(SPACE_GITHUB).fillna("")
+        )
+
+    @property
+    def agent_ids(self):
+        """
+        The set of all agent_id in ReadAct
+        """
+        return self._get("agent_ids", lambda: set(self.agent_table()["agent_id"]))
+
+    @property
+    def wikidata_ids(self):
+        """
+        The set of all non-empty wikidata_id in the Agent table of ReadAct
+        """
+        return self._get(
+            "wikidata_ids",
+            lambda: {x for x in self.agent_table()["wikidata_id"] if x},
+        )
+
+    @property
+    def space_ids(self):
+        """
+        The set of all space_id in ReadAct
+        """
+        return self._get("space_ids", lambda: set(self.space_table()["space_id"]))
+
+    @property
+    def last_space_id(self):
+        return self._get("last_space_id", lambda: max(self.space_ids))
+
+    @property
+    def space_wikidata_ids(self):
+        """
+        The set of all wikidata_id in the Space table of ReadAct
+        """
+        return self._get(
+            "space_wikidata_ids", lambda: set(self.space_table()["wikidata_id"])
+        )
+
+    @property
+    def space_names(self):
+        """
+        A dictionary, key: space_name, value: space_id
+        """
+        return self._get(
+            "space_names", lambda: space_dict_for_agents(self.space_table())
+        )
+
+    def row(self, entity_type, entity_id, language):
+        """
+        :return: the first ReadAct row of `entity_type` ("Person", "Institution" or "Space") with this id and language
+        """
+        return self._frame(entity_type).iloc[
+            self._rows(entity_type)[(entity_id, language)]
+        ]
+
+    def _frame(self, entity_type):
+        if entity_type == "Space":
+            return self.space_table()
+        return self.agent_tables(entity_type)[0]
+
+    def _rows(self, entity_type):
+        def build():
+            df = self._frame(entity_type)
+            rows = {}
+            for position, key in enumerate(
+                zip(df[ID_COLUMNS[entity_type]], df["language"])
+            ):
+                rows.setdefault(key, position)
+            return rows
+
+        return self._get(("rows", entity_type), build)
+
+
+def space_dict_for_agents(df_space):
+    space_dict = {}
+    for space_name, space_id in zip(df_space["space_name"], df_space["space_id"]):
+        # consider the case that if there are identical space_names in csv file
+        if space_name not in space_dict.keys():
+            # key: 'space_name'
+            # value: 'space_id'
+            space_dict[space_name] = space_id
+        else:
+            # ToDo(QG): Is it on purpose that we have reduplicated space_name ?
+            logger.warning(
+                "There are reduplicated space_name in ReadAct. Please notice the maintainer."
+            )
+            continue
+    space_dict[""] = ""
+    space_dict[None] = ""
+    space_dict[float("nan")] = ""
+    return space_dict
@@ -0,0 +1,147 @@
+"""
+A local snapshot of the ReadAct tables on GitHub.
+
+Each ReadAct CSV is downloaded at most once per run and kept on disk. On the next run it is revalidated with a
+conditional GET (`If-None-Match` / `If-Modified-Since`), so an unchanged table is not downloaded again. In offline
+mode only the local snapshot is used.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import requests
+
+from src.scripts import http_client
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "readactor",
+    "readact",
+)
+
+logger = logging.getLogger(__name__)
+
+_settings = {"directory": DEFAULT_DIRECTORY, "offline": False}
+# url: local path, for the tables already fetched in this run
+_fetched = {}
+# (url, read_csv arguments): dataframe, for the tables already parsed in this run
+_frames = {}
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    """
+    Change the settings of the snapshot, e.g. `configure(offline=True)`.
+    :param directory: the directory to keep the ReadAct tables in
+    :param offline: True to use only the local snapshot
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError("Unknown snapshot settings: %s" % ", ".join(sorted(unknown)))
+    with _lock:
+        _settings.update(settings)
+        _fetched.clear()
+        _frames.clear()
+
+
+def settings():
+    """
+    :return: a copy of the current settings, e.g. to configure a worker process the same way
+    """
+    return dict(_settings)
+
+
+def read_csv(path, **kwargs):
+    """
+    A drop-in replacement of `pd.read_csv` which reads URLs from the local snapshot.
+    :param path: a URL of a ReadAct table, or a local path
+    :param kwargs: arguments for `pd.read_csv`
+    :return: a dataframe. Every call returns a new copy, so it can be modified by the caller.
+    """
+    if not str(path).startswith(("https://", "http://")):
+        return pd.read_csv(path, **kwargs)
+    key = (path, repr(sorted(kwargs.items())))
+    with _lock:
+        if key not in _frames:
+            _frames[key] = pd.read_csv(fetch(path), **kwargs)
+        return _frames[key].copy()
+
+
+def fetch(url):
+    """
+    Make sure the table at `url` is in the local snapshot and up to date.
+    :return: the local path of the table
+    """
+    if url in _fetched:
+        return _fetched[url]
+    path, meta_path = _local_paths(url)
+    meta = {}
+    if os.path.isfile(path) and os.path.isfile(meta_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+
+    if _settings["offline"]:
+        if not meta:
+            logger.error(
+                "There is no local copy of %s. Please run ReadActor once without --offline."
+                % url
+            )
+            sys.exit()
+        logger.info("Offline: using the local copy of %s." % url)
+    else:
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = http_client.get(url, headers=headers)
+        except requests.RequestException as e:
+            if not meta:
+                raise
+            logger.warning("Could not reach %s (%s), using the local copy." % (url, e))
+        else:
+            if response.status_code == 304:
+                logger.debug("%s is not modified." % url)
+            else:
+                response.raise_for_status()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(response.content)
+                os.replace(path + ".tmp", path)
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "sha256": hashlib.sha256(response.content).hexdigest(),
+                    "fetched": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                with open(meta_path, "w") as f:
+                    json.dump(meta, f)
+                logger.info("Downloaded %s." % url)
+    _fetched[url] = path
+    return path
+
+
+def version(url):
+    """
+    :return: the SHA-256 of the local snapshot of the table at `url`, which changes whenever the table changes
+    """
+    fetch(url)
+    with open(_local_paths(url)[1], "r") as f:
+        return json.load(f)["sha256"]
+
+
+def _local_paths(url):
+    name = (
+        hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        + "_"
+        + os.path.basename(url)
+    )
+    path = os.path.join(_settings["directory"], name)
+    return path, path + ".json"
@@ -1,6 +1,7 @@
 import importlib
 import logging
 import os
+import re
 import sys
 from datetime import date
 from importlib.metadata import version
@@ -9,11 +10,20 @@ import click
 import numpy as np
 import pandas as pd
 
-from src.scripts.agent_table_processing import process_agent_tables
-from src.scripts.authenticity_space import get_coordinate_from_wikidata, get_QID
+from src.scripts import cache, journal, manifest, readact_snapshot, wikidata_api
+from src.scripts.agent_table_processing import (
+    process_agent_tables,
+    sync_agent_wikidata_ids,
+)
+from src.scripts.authenticity_space import (
+    get_coordinate_from_wikidata,
+    get_coordinates_from_wikidata,
+    get_QID,
+)
 from src.scripts.process_Institution import process_Inst
 from src.scripts.process_Person import process_Pers
 from src.scripts.process_Space import process_Spac
+from src.scripts.readact_index import ReadActIndex, space_dict_for_agents
 
 # Creating an object
 logger = logging.getLogger()
@@ -21,9 +31,6 @@ formatter = logging.Formatter(
     "%(asctime)s - %(name)s - %(levelname)s: - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
 )
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
-SPACE_GITHUB = (
-    "https://raw.githubusercontent.com/readchina/ReadAct/master/csv/data/Space.csv"
-)
 
 
 def combine_space_tables(df_space_user, df_space_gh, space_ids_gh):
@@ -54,29 +61,38 @@ def combine_space_tables(df_space_user, df_space_gh, space_ids_gh):
         "last_modified",
         "last_modified_by",
     ]
+    # as strings, since the coordinates of a table read from CSV are floats, but those of new entries are strings
     df_processd = pd.merge(
-        df_space_gh, df_space_user_not_in_gh, on=space_cols, how="outer"
+        df_space_gh.fillna("").astype(str),
+        df_space_user_not_in_gh.fillna("").astype(str),
+        on=space_cols,
+        how="outer",
     )
     return df_processd
 
 
 def create_new_space_entry(
-    df, place_dict_combined, today, place_name, combined_two_space, entity_type, path
+    df,
+    place_dict_combined,
+    today,
+    place_name,
+    combined_two_space,
+    entity_type,
+    path,
+    readact_index=None,
+    df_space_user=None,
 ):
-    # Read Space.csv from ReadAct
-    df_space_gh = pd.read_csv(SPACE_GITHUB).fillna("")
-    space_ids_gh = df_space_gh["space_id"].tolist()
-    space_ids_gh.sort()
-    last_space_id = space_ids_gh[-1]
+    if readact_index is None:
+        readact_index = ReadActIndex()
+    # Space.csv from ReadAct
+    df_space_gh = readact_index.space_table().copy()
+    space_ids_gh = readact_index.space_ids
 
     if (
         combined_two_space is True
     ):  # Already read local Space.csv. Must combine two space table.
-        if entity_type == "Person":
-            path_space_user = path[:-10] + "Space.csv"
-        elif entity_type == "Institution":
-            path_space_user = path[:-15] + "Space.csv"
-        df_space_user = pd.read_csv(path_space_user)
+        if df_space_user is None:
+            df_space_user = pd.read_csv(space_table_path(path, entity_type))
         df_space_processed = combine_space_tables(
             df_space_user, df_space_gh, space_ids_gh
         )
@@ -84,89 +100,251 @@ def create_new_space_entry(
         # attention that if ReadActor find any new space entity then to save a new Space table might overwrite any
         # potential local Space.csv
         df_space_processed = df_space_gh
+    # New space_id are counted on from the last one in ReadAct and in the local Space.csv, so that they never collide
+    last_space_id = max(
+        (i for i in df_space_processed["space_id"] if re.fullmatch(r"SP\d+", str(i))),
+        key=lambda i: int(i[2:]),
+        default=readact_index.last_space_id,
+    )
 
-    flag = False  # Flag to show if any new entries are added
-    for index, row in df.iterrows():
-        if (
-            row[place_name] is None
-            or pd.isna(row[place_name])
-            or len(str(row[place_name])) == 0
-        ):
-            continue
-        elif row[place_name] in place_dict_combined:
-            continue
+    # The distinct places which are neither in ReadAct nor in the local Space.csv, in order of appearance
+    new_space_names = list(
+        dict.fromkeys(
+            place
+            for place in df[place_name]
+            if not (place is None or pd.isna(place) or len(str(place)) == 0)
+            and place not in place_dict_combined
+        )
+    )
+    if len(new_space_names) == 0:
+        return df_space_processed, False  # no new entries are added
+    if int(last_space_id[2:]) + len(new_space_names) - 1 > 9999:
+        logger.error(
+            "Please inform the maintainer to update the schema of Space and modify scripts accordingly."
+        )
+        sys.exit()
+
+    # New spaces introduced by SPAQRL query: one search per distinct name, then one query for all coordinates
+    query_spaces = {name: get_QID(name) for name in new_space_names}
+    coordinates = get_coordinates_from_wikidata(
+        [q["id"] for q in query_spaces.values() if q is not None]
+    )
+
+    # Append new entries
+    # space_id,old_id,space_type,space_name,language,lat,long,wikidata_id,note,created,created_by,
+    # last_modified,last_modified_by
+    new_entries = []
+    for new_space_name in new_space_names:
+        # zero-padded to the width of the existing IDs, e.g. SP0100 -> SP0101
+        new_space_id = last_space_id[0:2] + str(int(last_space_id[2:]) + 1).zfill(
+            len(last_space_id) - 2
+        )
+        query_space = query_spaces[new_space_name]
+        new_lat = ""
+        new_long = ""
+        if query_space is None:
+            new_wikidata_id = ""
+            new_space_type = "L"  # L for locations (with NULL coordinates)
         else:
-            # New space introduced by SPAQRL query
-            # Append new entries
-            # space_id,old_id,space_type,space_name,language,lat,long,wikidata_id,note,created,created_by,
-            # last_modified,last_modified_by
-            if int(last_space_id[2:]) > 9999:
-                logger.error(
-                    "Please inform the maintainer to update the schema of Space and modify scripts accordingly."
-                )
-                sys.exit()
-            new_space_id = last_space_id[0:2] + str(int(last_space_id[2:]) + 1)
-            new_space_name = row[place_name]
-            new_language = "en"
-            new_created = today
-            new_created_by = "ReadActor"
-            query_space = get_QID(new_space_name)
-            if query_space is None:
-                new_wikidata_id = ""
-                new_lat = ""
-                new_long = ""
-                new_space_type = "L"  # L for locations (with NULL coordinates)
-            else:
-                coordinate = get_coordinate_from_wikidata(query_space["id"])[0]
-                new_wikidata_id = query_space["id"]
-                if len(coordinate) == 0:
-                    new_lat = ""
-                    new_long = ""
-                elif len(coordinate) == 1:
-                    new_long = coordinate[0]
-                    new_lat = ""
-                elif len(coordinate) == 2:
-                    new_lat = coordinate[1]
-                    new_long = coordinate[0]
-                new_space_type = "PL"  # PL for place
-            df_space_processed.loc[len(df_space_processed.index)] = [
+            new_wikidata_id = query_space["id"]
+            if new_wikidata_id in coordinates:
+                coordinate = (coordinates[new_wikidata_id] or [[]])[0]
+            else:  # the bulk query failed for it
+                coordinate = (get_coordinate_from_wikidata(new_wikidata_id) or [[]])[0]
+            if len(coordinate) == 1:
+                new_long = coordinate[0]
+            elif len(coordinate) == 2:
+                new_lat = coordinate[1]
+                new_long = coordinate[0]
+            new_space_type = "PL"  # PL for place
+        new_entries.append(
+            [
                 new_space_id,
                 "",  # space_type
                 new_space_type,
                 new_space_name,
-                new_language,
+                "en",  # language
                 new_lat,
                 new_long,
                 new_wikidata_id,
                 "",  # note
-                new_created,
-                new_created_by,
+                today,  # created
+                "ReadActor",  # created_by
                 "",  # last_modified
                 "",  # last_modified_by
             ]
-            flag = True
-            last_space_id = new_space_id
-    return df_space_processed, flag
-
-
-def space_dict_for_agents(df_space):
-    space_dict = {}
-    for index, row in df_space.iterrows():
-        # consider the case that if there are identical space_names in csv file
-        if row["space_name"] not in space_dict.keys():
-            # key: 'space_name'
-            # value: 'space_id'
-            space_dict[row["space_name"]] = row["space_id"]
+        )
+        last_space_id = new_space_id
+    df_space_processed = pd.concat(
+        [
+            df_space_processed,
+            pd.DataFrame(new_entries, columns=df_space_processed.columns),
+        ],
+        ignore_index=True,
+    )
+    return df_space_processed, True
+
+
+def space_table_path(path, entity_type):
+    """
+    :return: the path of the local Space.csv in the same directory as the Person/Institution table at `path`
+    """
+    if entity_type == "Person":
+        return path[:-10] + "Space.csv"
+    elif entity_type == "Institution":
+        return path[:-15] + "Space.csv"
+
+
+def check_space_table(path, concurrency=1, readact_index=None, workers=1):
+    """
+    Check the Space table at `path`.
+    :return: the checked dataframe
+    """
+    df = pd.read_csv(path)  # index_col=0
+    df = df.fillna("")  # Replace all the nan into empty string
+    return process_Spac(df, concurrency, readact_index, workers)
+
+
+def check_agent_table(
+    path,
+    entity_type,
+    today,
+    concurrency=1,
+    readact_index=None,
+    df_space_user=None,
+    df_agent=None,
+    workers=1,
+):
+    """
+    Check the Person or Institution table at `path`, add the new places it introduces to the Space table, and copy
+    the checked wikidata_id into the Agent table.
+    :param df_space_user: the local Space table if it is already read, e.g. checked or extended by the tables before.
+    Otherwise the local Space.csv is read if needed.
+    :param df_agent: the Agent table if it is already read and updated by the tables before. Otherwise it is read from
+    the Agent.csv in the same directory as `path`.
+    :return: the checked table, the Agent table, the Space table, and True if new Space entries are added to it
+    """
+    if entity_type == "Person":
+        a_id = "person_id"
+        place_name = "place_of_birth"
+        agent_user_path = path[:-10] + "Agent.csv"
+    elif entity_type == "Institution":
+        a_id = "inst_id"
+        place_name = "place"
+        agent_user_path = path[:-15] + "Agent.csv"
+    (
+        df,
+        agent_processed,
+        _,
+        _,
+        _,
+        place_dict_combined,
+        combined_two_space,
+    ) = process_agent_tables(entity_type, "user", path=[path, agent_user_path])
+    if df_agent is None:
+        df_agent = agent_processed.loc[
+            agent_processed["agent_id"].str[2:].astype(int).sort_values().index
+        ].reset_index(drop=True)
+
+    if entity_type == "Person":
+        df = process_Pers(df, entity_type, concurrency, readact_index, workers)
+    elif entity_type == "Institution":
+        df = process_Inst(df, entity_type, concurrency, readact_index, workers)
+    df = df.loc[df[a_id].str[2:].astype(int).sort_values().index].reset_index(
+        drop=True
+    )  # Sort Person.csv/Institution.csv by person_id/inst_id
+
+    space_dict = readact_index.space_names
+    if df_space_user is not None:
+        # The places of the local Space table, including the ones added by the tables before, are not new
+        space_dict = {**space_dict_for_agents(df_space_user), **space_dict}
+        place_dict_combined = {
+            **dict.fromkeys(df_space_user["space_id"]),
+            **place_dict_combined,
+        }
+        combined_two_space = True
+    df = df.replace({place_name: space_dict})
+    df_space_processed, flag_space_table = create_new_space_entry(
+        df,
+        place_dict_combined,
+        today,
+        place_name,
+        combined_two_space,
+        entity_type,
+        path,
+        readact_index,
+        df_space_user,
+    )
+
+    # after adding new space entry, replace space name with new space ID
+    df = df.replace({place_name: space_dict_for_agents(df_space_processed)})
+    if entity_type == "Person":
+        df["narrative_age"] = pd.to_numeric(
+            df["narrative_age"], errors="coerce"
+        ).astype("Int64")
+
+    # copy the checked wikidata_id into the Agent table
+    df_agent = sync_agent_wikidata_ids(df_agent, df, a_id, today)
+    return df, df_agent, df_space_processed, flag_space_table
+
+
+def check_directory(
+    path,
+    today,
+    concurrency=1,
+    readact_index=None,
+    space=True,
+    agents=True,
+    workers=1,
+):
+    """
+    Check all the tables in the directory `path` in one pass: Space first, then Person and Institution. The ReadAct
+    tables are read once for all of them, and the places added to the Space table by Person are known to
+    Institution.
+    :param space: False to not check Space.csv
+    :param agents: False to not check Person.csv and Institution.csv
+    :return: a dictionary, key: the file name, e.g. "Person.csv", value: the table to write to it
+    """
+    if readact_index is None:
+        readact_index = ReadActIndex()
+    tables = {}
+    df_space = None
+    df_agent = None
+    space_path = os.path.join(path, "Space.csv")
+    if os.path.isfile(space_path):
+        if space:
+            df_space = check_space_table(
+                space_path, concurrency, readact_index, workers
+            )
+            tables["Space.csv"] = df_space
         else:
-            # ToDo(QG): Is it on purpose that we have reduplicated space_name ?
-            logger.warning(
-                "There are reduplicated space_name in ReadAct. Please notice the maintainer."
+            df_space = pd.read_csv(space_path).fillna("")
+    if agents:
+        for entity_type in ["Person", "Institution"]:
+            table_path = os.path.join(path, entity_type + ".csv")
+            if not os.path.isfile(table_path):
+                continue
+            df, df_agent, df_space_processed, flag_space_table = check_agent_table(
+                table_path,
+                entity_type,
+                today,
+                concurrency,
+                readact_index,
+                df_space,
+                df_agent,
+                workers,
             )
-            continue
-    space_dict[""] = ""
-    space_dict[None] = ""
-    space_dict[float("nan")] = ""
-    return space_dict
+            tables[entity_type + ".csv"] = df.drop(columns="wikidata_id")
+            tables["Agent.csv"] = df_agent
+            if flag_space_table:
+                df_space = df_space_processed
+                tables["Space.csv"] = df_space
+    if len(tables) == 0:
+        logger.error(
+            "There is no Space.csv, Person.csv or Institution.csv in %s ." % path
+        )
+        sys.exit()
+    return tables
 
 
 # eager
@@ -262,8 +440,78 @@ def log(level):
     is_flag=True,
     help="Process only agents (persons and institutions)",
 )
+@click.option(
+    "-N",
+    "--no-cache",
+    is_flag=True,
+    help="Do not read or write the local cache of Wikidata answers",
+)
+@click.option(
+    "-R",
+    "--refresh-cache",
+    is_flag=True,
+    help="Query Wikidata again and refresh the local cache",
+)
+@click.option(
+    "-O",
+    "--offline",
+    is_flag=True,
+    help="Use the local copy of the ReadAct tables, do not check GitHub for updates",
+)
+@click.option(
+    "-C",
+    "--concurrency",
+    type=int,
+    default=1,
+    metavar="N",
+    help="Check N rows at the same time (default 1)",
+)
+@click.option(
+    "-B",
+    "--backend",
+    type=click.Choice(wikidata_api.BACKENDS),
+    default="sparql",
+    metavar="NAME",
+    help="Fetch Wikidata items by ID with NAME: sparql (default) or wbgetentities",
+)
+@click.option(
+    "-r",
+    "--resume",
+    is_flag=True,
+    help="Continue an aborted run, do not check the rows in its journal again",
+)
+@click.option(
+    "-I",
+    "--incremental",
+    is_flag=True,
+    help="Check only the rows which changed since the last incremental run",
+)
+@click.option(
+    "-W",
+    "--workers",
+    type=int,
+    default=1,
+    metavar="N",
+    help="Check the rows in N processes, for large tables (default 1)",
+)
 @click.argument("path", default=".", type=str)
-def cli(path, interactive, quiet, output, summary, space, agents):
+def cli(
+    path,
+    interactive,
+    quiet,
+    output,
+    summary,
+    space,
+    agents,
+    no_cache,
+    refresh_cache,
+    offline,
+    concurrency,
+    backend,
+    resume,
+    incremental,
+    workers,
+):
     if interactive:
         click.confirm("Do you want to update the table?", default=False, abort=True)
 
@@ -273,6 +521,57 @@ def cli(path, interactive, quiet, output, summary, space, agents):
         level = logging.INFO
 
     log(level)
+    cache.configure(enabled=not no_cache, refresh=refresh_cache)
+    readact_snapshot.configure(offline=offline)
+    wikidata_api.configure(backend=backend)
+    # The ReadAct tables and their lookup maps, shared by all the steps of this run
+    readact_index = ReadActIndex()
+
+    today = date.today().strftime("%Y-%m-%d")
+
+    if os.path.isdir(path):
+        # process all the tables in the directory: Space, Person, Institution
+        check_space = space or not agents
+        check_agents = agents or not space
+        # Record each checked row, so that an aborted run can be continued with --resume
+        journal.start(journal.journal_path(path), resume)
+        if incremental:
+            # only for the tables which are checked, the manifests of the others are kept as they are
+            entity_types = (["Space"] if check_space else []) + (
+                ["Person", "Institution"] if check_agents else []
+            )
+            for entity_type in entity_types:
+                table_path = os.path.join(path, entity_type + ".csv")
+                if os.path.isfile(table_path):
+                    manifest.start(
+                        entity_type,
+                        manifest.manifest_path(table_path),
+                        manifest.dependencies(entity_type),
+                    )
+        tables = check_directory(
+            path,
+            today,
+            concurrency,
+            readact_index,
+            space=check_space,
+            agents=check_agents,
+            workers=workers,
+        )
+        for file_name, df in tables.items():
+            if output:
+                with open(
+                    os.path.join(path, file_name[:-4] + "_updated.csv"), "w"
+                ) as f:
+                    f.write(df.to_csv(index=False))
+            elif summary:
+                print("\nSummary of %s:" % file_name)
+                print(df.to_csv(index=False))
+            else:
+                with open(os.path.join(path, file_name), "w") as f:
+                    f.write(df.to_csv(index=False))
+        journal.finish()
+        manifest.finish()
+        return
 
     if space:
         if "Space" not in path:
@@ -286,105 +585,33 @@ def cli(path, interactive, quiet, output, summary, space, agents):
                 "You want to process person/institution, but your input file path doesn't contain this kind of file."
             )
             sys.exit()
-    today = date.today().strftime("%Y-%m-%d")
+    # Record each checked row, so that an aborted run can be continued with --resume
+    journal.start(journal.journal_path(path), resume)
+    if incremental:
+        # Do not check the rows verified by the last incremental run again
+        for entity_type in manifest.READACT_TABLES:
+            if entity_type in path:
+                manifest.start(
+                    entity_type,
+                    manifest.manifest_path(path),
+                    manifest.dependencies(entity_type),
+                )
 
     # process the dataframe (Person, Space, Institution).
     if "Space" in path:
         entity_type = "Space"
-        df = pd.read_csv(path)  # index_col=0
-        df = df.fillna("")  # Replace all the nan into empty string
-        df = process_Spac(df)
-
-    elif "Person" in path:
-        entity_type = "Person"
-        place_name = "place_of_birth"
-        agent_user_path = path[:-10] + "Agent.csv"
-        (
-            df,
-            agent_processed,
-            _,
-            _,
-            _,
-            place_dict_combined,
-            combined_two_space,
-        ) = process_agent_tables(entity_type, "user", path=[path, agent_user_path])
-
-        agent_processed_sorted = agent_processed.loc[
-            agent_processed["agent_id"].str[2:].astype(int).sort_values().index
-        ].reset_index(drop=True)
+        df = check_space_table(path, concurrency, readact_index, workers)
 
-        df = process_Pers(df, entity_type)
-        df_sorted = df.loc[
-            df["person_id"].str[2:].astype(int).sort_values().index
-        ].reset_index(
-            drop=True
-        )  # Sort Person.csv by person_id
-        df = df_sorted
-
-        df_space_raw = pd.read_csv(SPACE_GITHUB)
-        space_dict = space_dict_for_agents(df_space_raw)
-        df = df.replace({"place_of_birth": space_dict})
-        df_space_processed, flag_space_table = create_new_space_entry(
-            df,
-            place_dict_combined,
-            today,
-            place_name,
-            combined_two_space,
-            entity_type,
-            path,
-        )
-
-    elif "Institution" in path:
-        entity_type = "Institution"
-        place_name = "place"
-        agent_user_path = path[:-15] + "Agent.csv"
-        (
-            df,
-            agent_processed,
-            _,
-            _,
-            _,
-            place_dict_combined,
-            combined_two_space,
-        ) = process_agent_tables(entity_type, "user", path=[path, agent_user_path])
-        agent_processed_sorted = agent_processed.loc[
-            agent_processed["agent_id"].str[2:].astype(int).sort_values().index
-        ].reset_index(drop=True)
-        df = process_Inst(df, entity_type)
-        df_sorted = df.loc[
-            df["inst_id"].str[2:].astype(int).sort_values().index
-        ].reset_index(
-            drop=True
-        )  # Sort Institution.csv by inst_id
-        df = df_sorted
-
-        df_space_raw = pd.read_csv(SPACE_GITHUB)
-        space_dict = space_dict_for_agents(df_space_raw)
-        df = df.replace({"place": space_dict})
-        df_space_processed, flag_space_table = create_new_space_entry(
-            df,
-            place_dict_combined,
-            today,
-            place_name,
-            combined_two_space,
-            entity_type,
-            path,
+    elif "Person" in path or "Institution" in path:
+        entity_type = "Person" if "Person" in path else "Institution"
+        if entity_type == "Person":
+            agent_user_path = path[:-10] + "Agent.csv"
+        else:
+            agent_user_path = path[:-15] + "Agent.csv"
+        df, df_agent, df_space_processed, flag_space_table = check_agent_table(
+            path, entity_type, today, concurrency, readact_index, workers=workers
         )
 
-    if entity_type == "Person":
-        a_id = "person_id"
-        # after adding new space entry, replace space name with new space ID
-        space_dict = space_dict_for_agents(df_space_processed)
-        df = df.replace({"place_of_birth": space_dict})
-        df["narrative_age"] = pd.to_numeric(
-            df["narrative_age"], errors="coerce"
-        ).astype("Int64")
-    elif entity_type == "Institution":
-        a_id = "inst_id"
-        # after adding new space entry, replace space name with new space ID
-        space_dict = space_dict_for_agents(df_space_processed)
-        df = df.replace({"place": space_dict})
-
     # output to new tables
     if output:
         if entity_type == "Space":
@@ -398,23 +625,11 @@ def cli(path, interactive, quiet, output, summary, space, agents):
             new_csv_path = path[:-4] + "_updated.csv"
             with open(new_csv_path, "w") as f3:
                 f3.write(df_person_or_inst.to_csv(index=False))
-            df_agent = agent_processed_sorted
-            for i in range(len(df_agent["agent_id"])):
-                for j in range(len(df[a_id])):
-                    if df_agent["agent_id"][i] == df[a_id][j]:
-                        if df_agent["wikidata_id"][i] != df["wikidata_id"][j]:
-                            df_agent.loc[i, "wikidata_id"] = df["wikidata_id"][j]
-                            df_agent.loc[i, "last_modified"] = today
-                            df_agent.loc[i, "last_modified_by"] = "ReadActor"
-                            logger.info("Wikidata id is updated. ")
             new_agent_user_path = agent_user_path[:-4] + "_updated.csv"
             with open(new_agent_user_path, "w") as f:
                 f.write(df_agent.to_csv(index=False))
             if flag_space_table:
-                if entity_type == "Person":
-                    path_space = path[:-10] + "Space_updated.csv"
-                elif entity_type == "Institution":
-                    path_space = path[:-15] + "Space_updated.csv"
+                path_space = space_table_path(path, entity_type)[:-4] + "_updated.csv"
                 with open(path_space, "w") as f:
                     f.write(df_space_processed.to_csv(index=False))
 
@@ -430,15 +645,6 @@ def cli(path, interactive, quiet, output, summary, space, agents):
             print("\nSummary of Person/Institution:")
             print(df_person_or_inst.to_csv(index=False))
 
-            df_agent = agent_processed_sorted
-            for i in range(len(df_agent["agent_id"])):
-                for j in range(len(df[a_id])):
-                    if df_agent["agent_id"][i] == df[a_id][j]:
-                        if df_agent["wikidata_id"][i] != df["wikidata_id"][j]:
-                            df_agent.loc[i, "wikidata_id"] = df["wikidata_id"][j]
-                            df_agent.loc[i, "last_modified"] = today
-                            df_agent.loc[i, "last_modified_by"] = "ReadActor"
-                            logger.info("Wikidata id is updated. ")
             # print("\nSummary of Agent:")
             # print(df_agent.to_csv(index=False))
 
@@ -456,28 +662,20 @@ def cli(path, interactive, quiet, output, summary, space, agents):
             df_person_or_inst.drop("wikidata_id", inplace=True, axis=1)
             with open(path, "w") as f3:
                 f3.write(df_person_or_inst.to_csv(index=False))
-            df_agent = agent_processed_sorted
-            for i in range(len(df_agent["agent_id"])):
-                for j in range(len(df[a_id])):
-                    if df_agent["agent_id"][i] == df[a_id][j]:
-                        if df_agent["wikidata_id"][i] != df["wikidata_id"][j]:
-                            df_agent.loc[i, "wikidata_id"] = df["wikidata_id"][j]
-                            df_agent.loc[i, "last_modified"] = today
-                            df_agent.loc[i, "last_modified_by"] = "ReadActor"
-                            logger.info("Wikidata id is updated. ")
             with open(agent_user_path, "w") as f:
                 f.write(df_agent.to_csv(index=False))
 
             if flag_space_table:
-                if entity_type == "Person":
-                    path_space = path[:-10] + "Space.csv"
-                elif entity_type == "Institution":
-                    path_space = path[:-15] + "Space.csv"
+                path_space = space_table_path(path, entity_type)
                 if os.path.isfile(path_space):
                     logger.warning("Your Space.csv at %s is overwritten. " % path_space)
                 with open(path_space, "w") as f:
                     f.write(df_space_processed.to_csv(index=False))
 
+    # The run is complete, the journal is not needed any more
+    journal.finish()
+    manifest.finish()
+
 
 if __name__ == "__main__":
     cli()
@@ -0,0 +1,153 @@
+"""
+Share the ReadAct dataframes with the worker processes of `--workers` through memory-mapped Arrow files.
+
+Each worker process needs the ReadAct tables (`df_person_gh`, `agent_processed`, the Space table, ...). Pickled with
+the rows of its shard, every worker would get its own copy of them. With pyarrow installed (`pip install
+ReadActor[arrow]`), `share` writes each dataframe once to an Arrow IPC file in a temporary directory instead, and
+only the path of the file is pickled: each worker maps the file read-only. Numeric columns and, with pandas >= 3,
+string columns are read from the mapped pages, which all processes share. With older pandas, the strings are still
+copied into Python objects in each worker.
+
+The tables read with `fillna("")` have numeric columns in which "" stands for a missing value, e.g. `birthyear` of
+the Person table or `start` of the Institution table. Arrow has no type for numbers mixed with strings, so these
+columns are written as numbers with nulls, and the nulls are read back as "". Unlike the other columns, they are
+copied into each worker, as Python objects.
+
+Without pyarrow, the dataframes are pickled as before, and so is a dataframe Arrow still cannot convert, with a
+warning.
+
+The files are removed when ReadActor exits, or by `clear`.
+"""
+import atexit
+import json
+import logging
+import numbers
+import os
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# the key of the schema metadata which lists the numeric columns with "" for missing values
+EMPTY_KEY = b"readactor.empty"
+
+# id of a shared dataframe: (the dataframe, its SharedFrame)
+_frames = {}
+_directory = {"path": None}
+_lock = threading.Lock()
+
+
+class SharedFrame:
+    """
+    A dataframe written to an Arrow IPC file. It is pickled as the path of the file and unpickled as the dataframe,
+    memory-mapped from the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return read_frame, (self.path,)
+
+
+def available():
+    """
+    :return: True if pyarrow is installed and dataframes can be shared
+    """
+    return pa is not None
+
+
+def share(value):
+    """
+    :param value: a dataframe, a tuple, or anything else
+    :return: `value` with each dataframe in it (at the top level or in a tuple) replaced by its SharedFrame, if Arrow
+    can convert it. Without pyarrow, `value` itself.
+    """
+    if not available():
+        return value
+    if isinstance(value, tuple):
+        return tuple(share(item) for item in value)
+    if not isinstance(value, pd.DataFrame):
+        return value
+    with _lock:
+        if id(value) not in _frames:
+            if _directory["path"] is None:
+                _directory["path"] = tempfile.mkdtemp(prefix="readactor-")
+                atexit.register(clear)
+            path = os.path.join(_directory["path"], "%s.arrow" % len(_frames))
+            try:
+                write_frame(value, path)
+                shared = SharedFrame(path)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                logger.warning("A dataframe is pickled instead of shared: %s" % e)
+                if os.path.isfile(path):
+                    os.remove(path)
+                shared = value
+            # keep the dataframe, so that its id is not taken by another one
+            _frames[id(value)] = (value, shared)
+        return _frames[id(value)][1]
+
+
+def write_frame(df, path):
+    """
+    Write `df` to the Arrow IPC file at `path`.
+    """
+    empty = [column for column in df.columns if _numbers_and_empty(df[column])]
+    if empty:
+        df = df.copy(deep=False)
+        for column in empty:
+            values = [None if x == "" else x for x in df[column]]
+            df[column] = pd.Series(values, index=df.index, dtype=object)
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, EMPTY_KEY: json.dumps(empty).encode("utf-8")}
+    )
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_frame(path):
+    """
+    :return: the dataframe in the Arrow IPC file at `path`, memory-mapped read-only
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # one block per column, so that numeric columns are not copied into a consolidated block. Integers with nulls are
+    # read as Python integers, not as floats.
+    df = table.to_pandas(split_blocks=True, integer_object_nulls=True)
+    for column in json.loads((table.schema.metadata or {}).get(EMPTY_KEY, b"[]")):
+        df[column] = df[column].astype(object).where(df[column].notna(), "")
+    return df
+
+
+def _numbers_and_empty(column):
+    # an object column of numbers and "", e.g. read with `fillna("")`
+    if column.dtype != object:
+        return False
+    types = column.map(type)
+    others = set(types) - {str}
+    return (
+        len(others) < len(set(types))
+        and len(others) > 0
+        and all(issubclass(t, numbers.Number) and t is not bool for t in others)
+        and (column[types == str] == "").all()
+    )
+
+
+def clear():
+    """
+    Remove the files of the shared dataframes.
+    """
+    with _lock:
+        if _directory["path"] is not None:
+            shutil.rmtree(_directory["path"], ignore_errors=True)
+        _directory["path"] = None
+        _frames.clear()
@@ -0,0 +1,213 @@
+"""
+A backend to fetch the properties of Wikidata items by their Q-identifiers with the MediaWiki `wbgetentities` API
+instead of the SPARQL endpoint.
+
+Up to 50 items are fetched with one request, and only the claims ReadActor compares are read: gender (P21), birth
+and death (P569, P570), place of birth (P19), coordinate (P625), headquarters (P159), located in (P131), location of
+formation (P740) and inception (P571). The items these claims refer to are then labelled with a second batched
+request. The results have the same shape as those of the SPARQL queries, so the backend can be switched with
+`configure(backend="wbgetentities")`.
+"""
+import logging
+import re
+
+from src.scripts import http_client
+
+API_URL = "https://www.wikidata.org/w/api.php"
+BACKENDS = ("sparql", "wbgetentities")
+BATCH_SIZE = 50  # the maximum number of IDs in one wbgetentities request
+LANGUAGE = "en"
+INST_CLAIMS = {
+    "headquarters": "P159",
+    "administrativeTerritorialEntity": "P131",
+    "locationOfFormation": "P740",
+}
+
+logger = logging.getLogger(__name__)
+
+_settings = {"backend": "sparql"}
+
+
+def configure(**settings):
+    """
+    Change the settings of the backend, e.g. `configure(backend="wbgetentities")`.
+    :param backend: "sparql" or "wbgetentities"
+    """
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError("Unknown backend settings: %s" % ", ".join(sorted(unknown)))
+    if settings.get("backend", BACKENDS[0]) not in BACKENDS:
+        raise ValueError("Unknown backend: %s" % settings["backend"])
+    _settings.update(settings)
+
+
+def settings():
+    """
+    :return: a copy of the current settings, e.g. to configure a worker process the same way
+    """
+    return dict(_settings)
+
+
+def enabled():
+    """
+    :return: True if the items are fetched with `wbgetentities`
+    """
+    return _settings["backend"] == "wbgetentities"
+
+
+def get_entities(Qids, props="claims", batch_size=BATCH_SIZE):
+    """
+    :param Qids: a list of Q-identifiers
+    :param props: the parts of the items to fetch, e.g. "claims|labels"
+    :param batch_size: the number of Q-identifiers in one request
+    :return: a dictionary, key: Q-identifier, value: the item, or None if it does not exist. Q-identifiers whose
+    request failed are not in the dictionary.
+    """
+    entities = {}
+    Qids = list(dict.fromkeys(q for q in Qids if re.fullmatch(r"Q\d+", str(q))))
+    for i in range(0, len(Qids), batch_size):
+        batch = Qids[i : i + batch_size]
+        data = http_client.get_json(
+            API_URL,
+            params={
+                "action": "wbgetentities",
+                "ids": "|".join(batch),
+                "props": props,
+                "languages": LANGUAGE,
+                "format": "json",
+            },
+        )
+        if data is None or "entities" not in data:
+            logger.warning("wbgetentities for %s Q-identifiers failed." % len(batch))
+            continue
+        for q in batch:
+            entity = data["entities"].get(q)
+            entities[q] = None if entity is None or "missing" in entity else entity
+    return entities
+
+
+def get_labels(Qids):
+    """
+    :return: a dictionary, key: Q-identifier, value: its label. Like the label service of SPARQL, an item without
+    label is labelled with its Q-identifier.
+    """
+    return {q: __label(entity, q) for q, entity in get_entities(Qids, "labels").items()}
+
+
+def get_persons(Qids):
+    """
+    :return: the same dictionary as `sparql_with_Qids` in `authenticity_person.py`
+    """
+    entities = get_entities(Qids, "claims|labels")
+    labels = get_labels(
+        q
+        for entity in entities.values()
+        if entity is not None
+        for p in ["P21", "P19"]
+        for q in __item_values(entity, p)[0:1]
+    )
+    persons = {}
+    for q, entity in entities.items():
+        if entity is None:
+            persons[q] = {}
+            continue
+        wiki_dict = {"Q-id": q, "name": __label(entity, q)}
+        for key, p in [("gender", "P21"), ("birthplace", "P19")]:
+            values = __item_values(entity, p)
+            if values:
+                wiki_dict[key] = labels.get(values[0], values[0])
+        for key, p in [("birthyear", "P569"), ("deathyear", "P570")]:
+            values = __time_values(entity, p)
+            if values:
+                wiki_dict[key] = __year(values[0])
+        persons[q] = wiki_dict
+    return persons
+
+
+def get_institutions(Qids):
+    """
+    :return: the same dictionary as `sparql_insts` in `authenticity_institution.py`
+    """
+    entities = get_entities(Qids, "claims|labels|sitelinks")
+    labels = get_labels(
+        q
+        for entity in entities.values()
+        if entity is not None
+        for p in INST_CLAIMS.values()
+        for q in __item_values(entity, p)
+    )
+    insts = {}
+    for q, entity in entities.items():
+        inst_wiki = {
+            "name": [],
+            "headquarters": [],
+            "administrativeTerritorialEntity": [],
+            "locationOfFormation": [],
+            "inception": [],
+            "QID": q,
+        }
+        # like the SPARQL query, only items with an article are considered
+        if entity is not None and entity.get("sitelinks"):
+            inst_wiki["name"] = __label(entity, q)
+            for key, p in INST_CLAIMS.items():
+                inst_wiki[key] = [labels.get(v, v) for v in __item_values(entity, p)]
+            inst_wiki["inception"] = [__date(v) for v in __time_values(entity, "P571")]
+        insts[q] = inst_wiki
+    return insts
+
+
+def get_coordinates(Qids):
+    """
+    :return: the same dictionary as `get_coordinates_from_wikidata` in `authenticity_space.py`
+    """
+    coordinates = {}
+    for q, entity in get_entities(Qids).items():
+        coordinates[q] = [
+            [str(v["longitude"]), str(v["latitude"])] for v in __values(entity, "P625")
+        ]
+    return coordinates
+
+
+def __label(entity, q):
+    if entity is None:
+        return q
+    return entity.get("labels", {}).get(LANGUAGE, {}).get("value", q)
+
+
+def __values(entity, p):
+    """
+    The values of the best ranked statements of property `p`, like the `wdt:` properties in SPARQL.
+    """
+    if entity is None:
+        return []
+    statements = [
+        s
+        for s in entity.get("claims", {}).get(p, [])
+        if s.get("rank") != "deprecated" and "datavalue" in s["mainsnak"]
+    ]
+    preferred = [s for s in statements if s.get("rank") == "preferred"]
+    return [s["mainsnak"]["datavalue"]["value"] for s in preferred or statements]
+
+
+def __item_values(entity, p):
+    return [v["id"] for v in __values(entity, p) if "id" in v]
+
+
+def __time_values(entity, p):
+    return [v["time"] for v in __values(entity, p) if "time" in v]
+
+
+def __date(time):
+    # "+1897-00-00T00:00:00Z" -> "1897-01-01T00:00:00Z", as returned by SPARQL
+    date, rest = time[1:].split("T", 1)
+    year, month, day = date.split("-")
+    date = "-".join(
+        [year, month if month != "00" else "01", day if day != "00" else "01"]
+    )
+    return ("-" if time[0] == "-" else "") + date + "T" + rest
+
+
+def __year(time):
+    # "+1881-09-25T00:00:00Z" -> "1881", "-0551-00-00T00:00:00Z" -> "-551"
+    year = int(time[1:].split("-")[0])
+    return str(-year if time[0] == "-" else year)
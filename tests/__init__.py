@@ -0,0 +1,5 @@
+from src.scripts import cache
+
+# The tests never read or write the cache of Wikidata answers in the home directory, the tests of the cache use a
+# temporary file
+cache.configure(enabled=False)
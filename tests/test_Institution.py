@@ -1,11 +1,17 @@
+import re
 import unittest
 from datetime import date
+from unittest import mock
 
 import pandas as pd
 
 from src.scripts.agent_table_processing import preparation, process_agent_tables
-from src.scripts.authenticity_institution import get_QID_inst
-from src.scripts.process_Institution import check_each_row_Inst, format_year_Inst
+from src.scripts.authenticity_institution import get_QID_inst, sparql_inst, sparql_insts
+from src.scripts.process_Institution import (
+    check_each_row_Inst,
+    format_year_Inst,
+    prefetch_insts_by_name,
+)
 
 
 class MyTestCase(unittest.TestCase):
@@ -72,6 +78,95 @@ class MyTestCase(unittest.TestCase):
             None,
         )
 
+    def test_it_should_pick_the_best_scoring_candidate(self):
+        def fake_get_json(url, params=None, **kwargs):
+            if params.get("action") == "wbsearchentities":
+                return {
+                    "success": 1,
+                    "search": [
+                        {"id": "Q1", "label": "Commercial Press"},
+                        {"id": "Q2", "label": "Commercial Press"},
+                    ],
+                }
+            return {
+                "results": {
+                    "bindings": [
+                        {
+                            "item": {"value": "http://www.wikidata.org/entity/Q1"},
+                            "headquartersLabel": {"value": "Hong Kong"},
+                        },
+                        {
+                            "item": {"value": "http://www.wikidata.org/entity/Q2"},
+                            "headquartersLabel": {"value": "Shanghai"},
+                            "inceptionLabel": {"value": "1897-02-11T00:00:00Z"},
+                        },
+                    ]
+                }
+            }
+
+        with mock.patch(
+            "src.scripts.http_client.get_json", side_effect=fake_get_json
+        ) as get_json:
+            self.assertEqual(
+                get_QID_inst("Commercial Press", "Shanghai", "1897"),
+                [{"id": "Q2", "label": "Commercial Press"}],
+            )
+            self.assertEqual(get_json.call_count, 2)
+            self.assertEqual(
+                get_QID_inst("Commercial Press"),
+                [{"id": "Q1", "label": "Commercial Press"}],
+            )
+
+    def test_bulk_query_should_be_chunked_and_merged(self):
+        def fake_get_json(url, params=None, **kwargs):
+            return {
+                "results": {
+                    "bindings": [
+                        {
+                            "item": {"value": "http://www.wikidata.org/entity/" + q},
+                            "itemLabel": {"value": "Institution " + q},
+                            "headquartersLabel": {"value": "City " + q},
+                        }
+                        for q in re.findall(r"wd:(Q\d+)", params["query"])
+                    ]
+                }
+            }
+
+        with mock.patch(
+            "src.scripts.http_client.get_json", side_effect=fake_get_json
+        ) as get_json:
+            inst_wikis = sparql_insts(["Q1", "Q2", "Q3"], batch_size=2)
+            self.assertEqual(get_json.call_count, 2)
+            self.assertEqual(inst_wikis["Q3"]["headquarters"], ["City Q3"])
+            # the properties of all QIDs are kept, not only those of the last one
+            inst_wiki = sparql_inst(["Q1", "Q2"])
+        self.assertEqual(inst_wiki["QID"], "Q1")
+        self.assertEqual(inst_wiki["headquarters"], ["City Q1", "City Q2"])
+
+    def test_language_rows_of_one_institution_are_resolved_once(self):
+        df = pd.DataFrame(
+            {
+                "inst_id": ["AG9001", "AG9001", "AG9002", "AG9002"],
+                "inst_name": ["商务印书馆", "Commercial Press", "中华书局", "Zhonghua"],
+                "language": ["zh", "en", "zh", "en"],
+                "place": ["上海", "Shanghai", "", ""],
+                "start": ["1897", "1897", "", ""],
+                "wikidata_id": ["", "", "Q1", ""],
+                "note": ["", "", "", ""],
+            }
+        )
+        with mock.patch(
+            "src.scripts.process_Institution.get_QID_inst_by_names",
+            return_value=[{"id": "Q2", "label": "Commercial Press"}],
+        ) as get_QID_inst_by_names:
+            insts_by_name = prefetch_insts_by_name(df, set())
+        get_QID_inst_by_names.assert_called_once_with(
+            ["商务印书馆", "Commercial Press"], ["上海", "Shanghai"], ["1897", "1897"]
+        )
+        self.assertEqual(insts_by_name["AG9001"][0]["id"], "Q2")
+        # the row without wikidata_id takes the one of its other language row
+        self.assertEqual(insts_by_name["AG9002"][0]["id"], "Q1")
+
     def test_it_should_add_infomation(self):
         self.row_inst = [
             "AG2000",
@@ -1,10 +1,16 @@
 import unittest
 from datetime import date
+from unittest import mock
 
 import pandas as pd
 
 from src.scripts.agent_table_processing import process_agent_tables
-from src.scripts.process_Person import check_each_row_Person
+from src.scripts.authenticity_person import (
+    get_Qids_from_wikipedia_titles,
+    sparql_with_Qid,
+    sparql_with_Qids,
+)
+from src.scripts.process_Person import check_each_row_Person, prefetch_persons_by_name
 
 
 class MyTestCase(unittest.TestCase):
@@ -484,6 +490,77 @@ class MyTestCase(unittest.TestCase):
         )
         # should test the warning and clean up after testing updated files
 
+    def test_bulk_query_should_match_single_query(self):
+        persons = sparql_with_Qids(["Q23114", "Q317521"], batch_size=1)
+        self.assertEqual(list(persons.keys()), ["Q23114", "Q317521"])
+        self.assertEqual(
+            persons["Q23114"]["birthyear"], sparql_with_Qid("Q23114")["birthyear"]
+        )
+        self.assertEqual(persons["Q317521"]["gender"], "male")
+
+
+class OfflineTestCase(unittest.TestCase):
+    """
+    The tests with a mocked Wikidata, which need neither the network nor the ReadAct tables.
+    """
+
+    def test_language_rows_of_one_person_are_resolved_once(self):
+        df = pd.DataFrame(
+            {
+                "person_id": ["AG9001", "AG9001", "AG9002", "AG9002"],
+                "family_name": ["鲁", "Lu", "胡", "Hu"],
+                "first_name": ["迅", "Xun", "适", "Shi"],
+                "language": ["zh", "en", "zh", "en"],
+                "wikidata_id": ["", "", "Q5", ""],
+                "note": ["", "", "", ""],
+            }
+        )
+        found = {
+            ("鲁迅", "zh"): {"Q23114": {"Q-id": "Q23114"}},
+            ("Xun Lu", "en"): {},
+            ("Lu Xun", "en"): {"Q23114": {"Q-id": "Q23114"}},
+        }
+        with mock.patch(
+            "src.scripts.process_Person.sparql_by_names", return_value=found
+        ) as sparql_by_names:
+            persons_by_name = prefetch_persons_by_name(df, set())
+        sparql_by_names.assert_called_once_with(
+            [("鲁迅", "zh"), ("Xun Lu", "en"), ("Lu Xun", "en")]
+        )
+        self.assertEqual(list(persons_by_name["AG9001"]), ["Q23114"])
+        # the row without wikidata_id takes the one of its other language row
+        self.assertEqual(list(persons_by_name["AG9002"]), ["Q5"])
+
+    def test_wikipedia_titles_are_resolved_in_batches(self):
+        def fake_get_json(url, params=None, **kwargs):
+            if not url.startswith("https://en."):
+                return {"query": {"pages": {}}}
+            return {
+                "query": {
+                    "normalized": [{"from": "lu_Xun", "to": "Lu Xun"}],
+                    "redirects": [{"from": "Zhou Shuren", "to": "Lu Xun"}],
+                    "pages": {
+                        "1": {
+                            "title": "Lu Xun",
+                            "pageprops": {"wikibase_item": "Q23114"},
+                        },
+                        "-1": {"title": "No Such Page", "missing": ""},
+                    },
+                }
+            }
+
+        links = [("en", "lu_Xun"), ("en", "Zhou Shuren"), ("en", "No Such Page")]
+        links += [("de", "Seite %s" % i) for i in range(51)]
+        with mock.patch(
+            "src.scripts.http_client.get_json", side_effect=fake_get_json
+        ) as get_json:
+            Qids = get_Qids_from_wikipedia_titles(links)
+        self.assertEqual(
+            Qids, {("en", "lu_Xun"): "Q23114", ("en", "Zhou Shuren"): "Q23114"}
+        )
+        # one request for the English titles, two for the 51 German titles
+        self.assertEqual(get_json.call_count, 3)
+
 
 if __name__ == "__main__":
     unittest.main()
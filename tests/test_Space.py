@@ -1,12 +1,16 @@
+import re
 import unittest
 from datetime import date
+from unittest import mock
 
 import pandas as pd
 
 from src.scripts.authenticity_space import (
     compare_to_openstreetmap,
     get_coordinate_from_wikidata,
+    get_coordinates_from_wikidata,
     get_QID,
+    get_QIDs,
 )
 from src.scripts.process_Space import process_Spac
 
@@ -46,6 +50,93 @@ class MyTestCase(unittest.TestCase):
             [["114.158611111", "22.278333333"]],
         )
 
+    def test_it_should_pick_the_nearest_candidate(self):
+        def fake_get_json(url, params=None, **kwargs):
+            if params.get("action") == "wbsearchentities":
+                return {
+                    "success": 1,
+                    "search": [
+                        {"id": "Q1", "label": "Victoria"},
+                        {"id": "Q2", "label": "Victoria"},
+                    ],
+                }
+            return {
+                "results": {
+                    "bindings": [
+                        {
+                            "item": {"value": "http://www.wikidata.org/entity/Q1"},
+                            "coordinate": {"value": "Point(-123.3 48.4)"},
+                        },
+                        {
+                            "item": {"value": "http://www.wikidata.org/entity/Q2"},
+                            "coordinate": {"value": "Point(114.1 22.2)"},
+                        },
+                    ]
+                }
+            }
+
+        with mock.patch("src.scripts.http_client.get_json", side_effect=fake_get_json):
+            self.assertEqual(get_QID("Victoria")["id"], "Q1")
+            self.assertEqual(get_QID("Victoria", 22.28, 114.15)["id"], "Q2")
+
+    def test_a_failed_search_finds_nothing(self):
+        with mock.patch("src.scripts.http_client.get_json", return_value=None):
+            self.assertEqual(get_QIDs("Victoria"), [])
+            self.assertIsNone(get_QID("Victoria"))
+
+    def test_bulk_query_should_match_single_query(self):
+        points = {
+            "Q8646": "Point(114.158611111 22.278333333)",
+            "Q956": "Point(116.4 39.9)",
+        }
+
+        def fake_get_json(url, params=None, **kwargs):
+            bindings = [
+                {
+                    "item": {"value": "http://www.wikidata.org/entity/" + q},
+                    "coordinate": {"value": points[q]},
+                }
+                for q in re.findall(r"wd:(Q\d+)", params["query"])
+            ]
+            return {"results": {"bindings": bindings}}
+
+        with mock.patch("src.scripts.http_client.get_json", side_effect=fake_get_json):
+            self.assertEqual(
+                get_coordinates_from_wikidata(["Q8646", "Q956"]),
+                {
+                    "Q8646": get_coordinate_from_wikidata("Q8646"),
+                    "Q956": get_coordinate_from_wikidata("Q956"),
+                },
+            )
+            self.assertEqual(
+                get_coordinate_from_wikidata("Q8646"),
+                [["114.158611111", "22.278333333"]],
+            )
+
+    def test_bulk_query_should_be_chunked(self):
+        def fake_get_json(url, params=None, **kwargs):
+            bindings = [
+                {
+                    "item": {"value": "http://www.wikidata.org/entity/" + q},
+                    "coordinate": {"value": "Point(1.5 2.5)"},
+                }
+                for q in re.findall(r"wd:(Q\d+)", params["query"])
+                if q != "Q3"
+            ]
+            return {"results": {"bindings": bindings}}
+
+        with mock.patch(
+            "src.scripts.http_client.get_json", side_effect=fake_get_json
+        ) as get_json:
+            coordinates = get_coordinates_from_wikidata(
+                ["Q1", "Q2", "Q3", "Q1", "nan"], batch_size=2
+            )
+        self.assertEqual(get_json.call_count, 2)
+        self.assertEqual(
+            coordinates,
+            {"Q1": [["1.5", "2.5"]], "Q2": [["1.5", "2.5"]], "Q3": []},
+        )
+
     def test_it_should_return_empty_list(self):
         self.assertEqual(
             compare_to_openstreetmap(
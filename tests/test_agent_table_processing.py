@@ -0,0 +1,68 @@
+import unittest
+
+import pandas as pd
+
+from src.scripts.agent_table_processing import (
+    addWikidataID_and_replaceSpace,
+    sync_agent_wikidata_ids,
+)
+
+
+class MyTestCase(unittest.TestCase):
+    def test_add_wikidata_id_and_replace_space(self):
+        df_person = pd.DataFrame(
+            {
+                "person_id": ["AG0001", "AG0002", "AG0003", "AG0004"],
+                "place_of_birth": ["SP0001", "", "SP9999", "SP0002"],
+                "wikidata_id": ["", "", "", ""],
+            }
+        )
+        df_agent = pd.DataFrame(
+            {
+                "agent_id": ["AG0001", "AG0002", "AG0003", "AG0003"],
+                "wikidata_id": ["Q23114", "", "Q1", "Q2"],
+            }
+        )
+        place_dict = {
+            "SP0001": ["Shanghai", "PL", 31.2, 121.4],
+            "SP0002": ["Beijing", "PL", 39.9, 116.3],
+        }
+        df = addWikidataID_and_replaceSpace(
+            df_person, df_agent, "person_id", place_dict, "Person"
+        )
+        self.assertEqual(
+            df["place_of_birth"].tolist(), ["Shanghai", "", "SP9999", "Beijing"]
+        )
+        # AG0003 occurs twice in the Agent table, so it gets no wikidata_id
+        self.assertEqual(df["wikidata_id"].tolist(), ["Q23114", "", "", ""])
+
+    def test_sync_agent_wikidata_ids(self):
+        df_agent = pd.DataFrame(
+            {
+                "agent_id": ["AG0001", "AG0002", "AG0003"],
+                "wikidata_id": ["Q23114", "", "Q1"],
+                "last_modified": ["2021-01-01", "2021-01-01", "2021-01-01"],
+                "last_modified_by": ["QG", "QG", "QG"],
+            }
+        )
+        df_person = pd.DataFrame(
+            {
+                "person_id": ["AG0001", "AG0002", "AG0002", "AG0004"],
+                "wikidata_id": ["Q23114", "Q5", "Q5", "Q6"],
+            }
+        )
+        df_agent = sync_agent_wikidata_ids(
+            df_agent, df_person, "person_id", "2023-05-01"
+        )
+        self.assertEqual(df_agent["wikidata_id"].tolist(), ["Q23114", "Q5", "Q1"])
+        self.assertEqual(
+            df_agent["last_modified"].tolist(),
+            ["2021-01-01", "2023-05-01", "2021-01-01"],
+        )
+        self.assertEqual(
+            df_agent["last_modified_by"].tolist(), ["QG", "ReadActor", "QG"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from src.scripts import cache, rate_limiter, wikidata_api
+from src.scripts.async_engine import (
+    check_in_processes,
+    check_rows,
+    write_rows,
+)
+
+
+def check_row(index, row, context):
+    if row["person_id"] in context:
+        sys.exit("row %s" % index)
+    row["note"] = "%s checked in %s" % (row["person_id"], os.getpid())
+    return row
+
+
+def check_row_settings(index, row, context):
+    row["note"] = "%s %s %s" % (
+        cache._connection is None,
+        wikidata_api.settings()["backend"],
+        rate_limiter.get_bucket("https://nominatim.openstreetmap.org/search").rate,
+    )
+    return row
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"note": ["", "", "", "", "", ""]})
+
+    def test_it_should_keep_the_row_order(self):
+        def check(index, row):
+            time.sleep(0.01 * (6 - index))  # later rows finish first
+            row["note"] = "row %s" % index
+            return row
+
+        rows = check_rows(self.df.iterrows(), check, 4)
+        self.assertEqual(
+            [row["note"] for row in rows], ["row %s" % i for i in range(6)]
+        )
+
+    def test_it_should_check_rows_at_the_same_time(self):
+        in_flight = []
+        lock = threading.Lock()
+
+        def check(index, row):
+            with lock:
+                in_flight.append(index)
+            time.sleep(0.05)
+            return row
+
+        start = time.monotonic()
+        check_rows(self.df.iterrows(), check, 6)
+        self.assertLess(time.monotonic() - start, 0.05 * 6)
+        self.assertEqual(sorted(in_flight), list(range(6)))
+
+    def test_it_should_abort_on_the_first_failing_row(self):
+        checked = []
+
+        def check(index, row):
+            checked.append(index)
+            if index in [1, 4]:
+                sys.exit("row %s" % index)
+            return row
+
+        with self.assertRaises(SystemExit) as cm:
+            check_rows(self.df.iterrows(), check, 1)
+        self.assertEqual(str(cm.exception), "row 1")
+        self.assertEqual(checked, [0, 1])
+
+        with self.assertRaises(SystemExit) as cm:
+            check_rows(self.df.iterrows(), check, 2)
+        self.assertEqual(str(cm.exception), "row 1")
+
+    def test_it_should_write_only_the_changed_cells(self):
+        df = pd.DataFrame(
+            {
+                "space_id": ["SP0001", "SP0002", "SP0003"],
+                "lat": [31.2, float("nan"), 39.9],
+                "note": ["", "", ""],
+            }
+        )
+
+        def check(index, row):
+            if index == 1:
+                row["note"] = "checked"
+            return row
+
+        changed = write_rows(df, check_rows(df.iterrows(), check))
+        self.assertEqual(changed, 1)
+        self.assertEqual(df["note"].tolist(), ["", "checked", ""])
+        self.assertEqual(df["lat"].dtype, float)
+
+    def test_it_should_check_the_rows_of_an_entity_in_the_same_process(self):
+        df = pd.DataFrame(
+            {
+                "person_id": ["AG0001", "AG0002", "AG0001", "AG0003", "AG0002"],
+                "note": ["", "", "", "", ""],
+            }
+        )
+        check = check_in_processes(df, "person_id", check_row, set(), 3, 2)
+        rows = check_rows(df.iterrows(), check)
+        self.assertEqual(
+            [row["note"].split()[0] for row in rows], df["person_id"].tolist()
+        )
+        pids = {}
+        for row in rows:
+            person_id, _, _, pid = row["note"].split()
+            self.assertEqual(pids.setdefault(person_id, pid), pid)
+            self.assertNotEqual(pid, str(os.getpid()))
+
+    def test_it_should_abort_in_order_when_a_process_aborts(self):
+        df = pd.DataFrame({"person_id": ["AG0001", "AG0002"], "note": ["", ""]})
+        check = check_in_processes(df, "person_id", check_row, {"AG0002"}, 2)
+        with self.assertRaises(SystemExit) as cm:
+            check_rows(df.iterrows(), check)
+        self.assertEqual(str(cm.exception), "row 1")
+
+    def test_processes_share_the_rates_and_keep_the_settings(self):
+        # in two different shards
+        df = pd.DataFrame({"person_id": ["AG0001", "AG0004"], "note": ["", ""]})
+        wikidata_api.configure(backend="wbgetentities")
+        self.addCleanup(wikidata_api.configure, backend="sparql")
+        with tempfile.TemporaryDirectory() as d:
+            cache.configure(path=os.path.join(d, "test.sqlite"), enabled=True)
+            self.addCleanup(cache.configure, path=cache.DEFAULT_PATH, enabled=False)
+            cache.put("https://query.wikidata.org/sparql", {}, {})  # an open connection
+            check = check_in_processes(df, "person_id", check_row_settings, None, 2)
+            rows = check_rows(df.iterrows(), check)
+        # each process opens its own connection, and together they send 1 request per second to Nominatim
+        for row in rows:
+            self.assertEqual(row["note"], "True wbgetentities 0.5")
+
+    def test_rows_of_a_shard_are_handed_on_when_it_is_done(self):
+        df = pd.DataFrame({"person_id": ["AG0001", "AG0004"], "note": ["", ""]})
+        handed_on = []
+        check_in_processes(
+            df,
+            "person_id",
+            check_row,
+            {"AG0004"},
+            2,
+            on_checked=lambda index, row, checked: handed_on.append(
+                (index, row["note"], checked["note"].split()[0])
+            ),
+        )
+        # before the rows are checked in order, and although the other shard aborted
+        self.assertEqual(handed_on, [(0, "", "AG0001")])
+
+    def test_processes_share_the_configured_rate(self):
+        df = pd.DataFrame({"person_id": ["AG0001", "AG0004"], "note": ["", ""]})
+        rate_limiter.configure(share=0.5)
+        self.addCleanup(rate_limiter.configure, share=1.0)
+        check = check_in_processes(df, "person_id", check_row_settings, None, 2)
+        for row in check_rows(df.iterrows(), check):
+            self.assertEqual(row["note"].split()[2], "0.25")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from src.scripts import cache
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        cache.configure(
+            path=os.path.join(self.tmp.name, "test.sqlite"),
+            ttl=60,
+            negative_ttl=60,
+            max_entries=100,
+            enabled=True,
+            refresh=False,
+        )
+        self.url = "https://query.wikidata.org/sparql"
+        self.hit = {"results": {"bindings": [{"item": {"value": "Q8646"}}]}}
+        self.no_hit = {"results": {"bindings": []}}
+
+    def tearDown(self):
+        cache.configure(
+            path=cache.DEFAULT_PATH,
+            ttl=cache.DEFAULT_TTL,
+            negative_ttl=cache.DEFAULT_NEGATIVE_TTL,
+            max_entries=cache.DEFAULT_MAX_ENTRIES,
+            enabled=False,
+            refresh=False,
+        )
+        self.tmp.cleanup()
+
+    def test_it_should_return_stored_answer_for_same_query(self):
+        cache.put(
+            self.url, {"format": "json", "query": "SELECT ?item\n  WHERE {}"}, self.hit
+        )
+        self.assertEqual(
+            cache.get(self.url, {"query": "SELECT ?item WHERE {}", "format": "json"}),
+            self.hit,
+        )
+        self.assertIsNone(cache.get(self.url, {"query": "SELECT ?x WHERE {}"}))
+
+    def test_it_should_expire_negative_answers_first(self):
+        cache.configure(negative_ttl=-1)
+        cache.put(self.url, {"query": "a"}, self.hit)
+        cache.put(self.url, {"query": "b"}, self.no_hit)
+        self.assertEqual(cache.get(self.url, {"query": "a"}), self.hit)
+        self.assertIsNone(cache.get(self.url, {"query": "b"}))
+
+    def test_it_should_evict_least_recently_used(self):
+        cache.configure(max_entries=2)
+        cache.put(self.url, {"query": "a"}, self.hit)
+        cache.put(self.url, {"query": "b"}, self.hit)
+        cache.get(self.url, {"query": "a"})
+        cache.put(self.url, {"query": "c"}, self.hit)
+        self.assertEqual(cache.get(self.url, {"query": "a"}), self.hit)
+        self.assertIsNone(cache.get(self.url, {"query": "b"}))
+
+    def test_it_should_count_replaced_and_stored_entries(self):
+        cache.configure(max_entries=2)
+        cache.put(self.url, {"query": "a"}, self.hit)
+        cache.put(self.url, {"query": "b"}, self.hit)
+        cache.put(self.url, {"query": "a"}, self.hit)  # replaced, not a new entry
+        self.assertEqual(cache.get(self.url, {"query": "b"}), self.hit)
+        # the entries already in the database are counted when it is opened again
+        cache.configure(path=os.path.join(self.tmp.name, "test.sqlite"))
+        cache.put(self.url, {"query": "c"}, self.hit)
+        self.assertIsNone(cache.get(self.url, {"query": "a"}))
+        self.assertEqual(cache.get(self.url, {"query": "b"}), self.hit)
+
+    def test_it_should_not_write_when_reading(self):
+        cache.put(self.url, {"query": "a"}, self.hit)
+        writes = cache._connect().total_changes
+        self.assertEqual(cache.get(self.url, {"query": "a"}), self.hit)
+        self.assertEqual(cache._connect().total_changes, writes)
+
+    def test_it_should_count_again_before_evicting(self):
+        cache.configure(max_entries=2)
+        cache.put(self.url, {"query": "a"}, self.hit)
+        cache.put(self.url, {"query": "b"}, self.hit)
+        # another process stores an entry and this one does not know
+        other = sqlite3.connect(os.path.join(self.tmp.name, "test.sqlite"))
+        other.execute(
+            "INSERT INTO responses VALUES ('other', ?, '{}', 0, ?, 0)",
+            (self.url, time.time() + 60),
+        )
+        other.commit()
+        other.close()
+        cache.put(self.url, {"query": "c"}, self.hit)
+        # the oldest entries are evicted until only 2 are left, its own as well
+        self.assertIsNone(cache.get(self.url, {"query": "a"}))
+        self.assertEqual(cache.get(self.url, {"query": "b"}), self.hit)
+        self.assertEqual(cache.get(self.url, {"query": "c"}), self.hit)
+
+    def test_answers_without_matches_should_be_negative(self):
+        self.assertTrue(cache.is_negative(self.no_hit))
+        self.assertTrue(cache.is_negative({"search": []}))
+        self.assertTrue(
+            cache.is_negative({"entities": {"Q0": {"id": "Q0", "missing": ""}}})
+        )
+        self.assertFalse(
+            cache.is_negative(
+                {"entities": {"Q0": {"missing": ""}, "Q8646": {"id": "Q8646"}}}
+            )
+        )
+        self.assertTrue(
+            cache.is_negative(
+                {"query": {"pages": {"-1": {"title": "X", "missing": ""}}}}
+            )
+        )
+        self.assertFalse(
+            cache.is_negative({"query": {"pages": {"42": {"title": "Hong Kong"}}}})
+        )
+        self.assertFalse(cache.is_negative(self.hit))
+
+    def test_it_should_bypass_and_refresh(self):
+        cache.put(self.url, {"query": "a"}, self.hit)
+        cache.configure(refresh=True)
+        self.assertIsNone(cache.get(self.url, {"query": "a"}))
+        cache.configure(refresh=False, enabled=False)
+        self.assertIsNone(cache.get(self.url, {"query": "a"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
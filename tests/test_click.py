@@ -21,17 +21,31 @@ class TestSum(unittest.TestCase):
             "Usage: cli [OPTIONS] [PATH]",
             "",
             "Options:",
-            "  -v, --version      Package version",
-            "  -d, --debug        Print full log output to console",
-            "  -i, --interactive  Prompt user for confirmation to continue",
-            "  -q, --quiet        Print no log output to console other then completion",
-            "                     message and error level events",
-            "  -o, --output       Do not update input table, but create a new file at <path>",
-            "                     instead",
-            "  -s, --summary      Do not update input table, but summarise results in console",
-            "  -S, --space        Process only places (places and locations)",
-            "  -A, --agents       Process only agents (persons and institutions)",
-            "  -h, --help         Show this message and exit.",
+            "  -v, --version        Package version",
+            "  -d, --debug          Print full log output to console",
+            "  -i, --interactive    Prompt user for confirmation to continue",
+            "  -q, --quiet          Print no log output to console other then completion",
+            "                       message and error level events",
+            "  -o, --output         Do not update input table, but create a new file at",
+            "                       <path> instead",
+            "  -s, --summary        Do not update input table, but summarise results in",
+            "                       console",
+            "  -S, --space          Process only places (places and locations)",
+            "  -A, --agents         Process only agents (persons and institutions)",
+            "  -N, --no-cache       Do not read or write the local cache of Wikidata answers",
+            "  -R, --refresh-cache  Query Wikidata again and refresh the local cache",
+            "  -O, --offline        Use the local copy of the ReadAct tables, do not check",
+            "                       GitHub for updates",
+            "  -C, --concurrency N  Check N rows at the same time (default 1)",
+            "  -B, --backend NAME   Fetch Wikidata items by ID with NAME: sparql (default) or",
+            "                       wbgetentities",
+            "  -r, --resume         Continue an aborted run, do not check the rows in its",
+            "                       journal again",
+            "  -I, --incremental    Check only the rows which changed since the last",
+            "                       incremental run",
+            "  -W, --workers N      Check the rows in N processes, for large tables (default",
+            "                       1)",
+            "  -h, --help           Show this message and exit.",
         ]
 
     def test_help_2_should_return_documentation(self):
@@ -43,17 +57,31 @@ class TestSum(unittest.TestCase):
             "Usage: cli [OPTIONS] [PATH]",
             "",
             "Options:",
-            "  -v, --version      Package version",
-            "  -d, --debug        Print full log output to console",
-            "  -i, --interactive  Prompt user for confirmation to continue",
-            "  -q, --quiet        Print no log output to console other then completion",
-            "                     message and error level events",
-            "  -o, --output       Do not update input table, but create a new file at <path>",
-            "                     instead",
-            "  -s, --summary      Do not update input table, but summarise results in console",
-            "  -S, --space        Process only places (places and locations)",
-            "  -A, --agents       Process only agents (persons and institutions)",
-            "  -h, --help         Show this message and exit.",
+            "  -v, --version        Package version",
+            "  -d, --debug          Print full log output to console",
+            "  -i, --interactive    Prompt user for confirmation to continue",
+            "  -q, --quiet          Print no log output to console other then completion",
+            "                       message and error level events",
+            "  -o, --output         Do not update input table, but create a new file at",
+            "                       <path> instead",
+            "  -s, --summary        Do not update input table, but summarise results in",
+            "                       console",
+            "  -S, --space          Process only places (places and locations)",
+            "  -A, --agents         Process only agents (persons and institutions)",
+            "  -N, --no-cache       Do not read or write the local cache of Wikidata answers",
+            "  -R, --refresh-cache  Query Wikidata again and refresh the local cache",
+            "  -O, --offline        Use the local copy of the ReadAct tables, do not check",
+            "                       GitHub for updates",
+            "  -C, --concurrency N  Check N rows at the same time (default 1)",
+            "  -B, --backend NAME   Fetch Wikidata items by ID with NAME: sparql (default) or",
+            "                       wbgetentities",
+            "  -r, --resume         Continue an aborted run, do not check the rows in its",
+            "                       journal again",
+            "  -I, --incremental    Check only the rows which changed since the last",
+            "                       incremental run",
+            "  -W, --workers N      Check the rows in N processes, for large tables (default",
+            "                       1)",
+            "  -h, --help           Show this message and exit.",
         ]
 
     def test_version_1_should_return_version(self):
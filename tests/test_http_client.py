@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from src.scripts import cache, http_client
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        cache.configure(enabled=False)
+        http_client.clear_flights()
+        self.url = "https://query.wikidata.org/sparql"
+        self.params = {"format": "json", "query": "SELECT ?item WHERE {}"}
+        self.hit = {"results": {"bindings": [{"item": {"value": "Q8646"}}]}}
+
+    def tearDown(self):
+        cache.configure(enabled=False)
+        http_client.clear_flights()
+
+    def test_concurrent_identical_requests_share_one_request(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_get(url, params=None):
+            started.set()
+            release.wait(5)
+            return FakeResponse(200, self.hit)
+
+        with mock.patch("src.scripts.http_client.get", side_effect=slow_get) as get:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [
+                    executor.submit(http_client.get_json, self.url, self.params)
+                    for _ in range(4)
+                ]
+                started.wait(5)
+                time.sleep(0.1)  # the other requests wait for the first one
+                release.set()
+                answers = [f.result() for f in futures]
+            self.assertEqual(get.call_count, 1)
+            # the answer is not remembered after it has landed, with the cache disabled
+            answers.append(http_client.get_json(self.url, dict(self.params)))
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(answers, [self.hit] * 5)
+        self.assertEqual(http_client._flights, {})
+
+    def test_failed_request_is_sent_again(self):
+        with mock.patch(
+            "src.scripts.http_client.get",
+            side_effect=[FakeResponse(500), FakeResponse(200, self.hit)],
+        ) as get:
+            self.assertIsNone(http_client.get_json(self.url, self.params))
+            self.assertEqual(http_client.get_json(self.url, self.params), self.hit)
+        self.assertEqual(get.call_count, 2)
+
+    def test_each_thread_has_its_own_session(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sessions = list(executor.map(lambda _: http_client.get_session(), range(2)))
+        self.assertIs(http_client.get_session(), http_client.get_session())
+        self.assertNotIn(http_client.get_session(), sessions)
+        http_client.close_session()
+
+    def test_it_should_always_send_request_without_cache(self):
+        with mock.patch(
+            "src.scripts.http_client.get", return_value=FakeResponse(200, self.hit)
+        ) as get:
+            http_client.get_json(self.url, self.params, use_cache=False)
+            http_client.get_json(self.url, self.params, use_cache=False)
+        self.assertEqual(get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
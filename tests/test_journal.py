@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.scripts import journal
+from src.scripts.async_engine import check_rows, write_rows
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = journal.journal_path(os.path.join(self.tmp.name, "Person.csv"))
+        self.df = pd.DataFrame(
+            {"person_id": ["AG0001", "AG0002", "AG0003"], "note": ["", "", ""]}
+        )
+
+    def tearDown(self):
+        journal.finish(remove=False)
+        self.tmp.cleanup()
+
+    def run_checks(self, df, checked, abort_at=None):
+        def check(index, row):
+            if row["person_id"] == abort_at:
+                sys.exit("conflict in row %s" % index)
+            checked.append(row["person_id"])
+            row["note"] = "checked"
+            return row
+
+        write_rows(df, check_rows(df.iterrows(), journal.replay("Person", check)))
+        return df
+
+    def test_journal_path(self):
+        self.assertEqual(
+            journal.journal_path("data/Person.csv"), "data/Person.journal.jsonl"
+        )
+
+    def test_it_should_resume_after_the_last_checked_row(self):
+        checked = []
+        journal.start(self.path)
+        with self.assertRaises(SystemExit):
+            self.run_checks(self.df.copy(), checked, abort_at="AG0002")
+        journal.finish(remove=False)
+        self.assertEqual(checked, ["AG0001"])
+
+        checked = []
+        journal.start(self.path, resume=True)
+        self.assertEqual(
+            journal.pending("Person", self.df)["person_id"].tolist(),
+            ["AG0002", "AG0003"],
+        )
+        df = self.run_checks(self.df.copy(), checked)
+        self.assertEqual(checked, ["AG0002", "AG0003"])
+        self.assertEqual(df["note"].tolist(), ["checked"] * 3)
+        journal.finish()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_changed_rows_are_checked_again(self):
+        journal.start(self.path)
+        self.run_checks(self.df.copy(), [])
+        journal.finish(remove=False)
+
+        checked = []
+        df = self.df.copy()
+        df.loc[1, "person_id"] = "AG0004"
+        journal.start(self.path, resume=True)
+        self.run_checks(df, checked)
+        self.assertEqual(checked, ["AG0004"])
+
+    def test_recorded_rows_are_not_appended_again(self):
+        journal.start(self.path)
+        row = self.df.loc[0].copy()
+        checked = row.copy()
+        checked["note"] = "checked elsewhere"
+        journal.record("Person", 0, row, checked)
+        self.run_checks(self.df.copy(), [])
+        journal.finish(remove=False)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        checked = []
+        journal.start(self.path, resume=True)
+        df = self.run_checks(self.df.copy(), checked)
+        self.assertEqual(checked, [])
+        self.assertEqual(
+            df["note"].tolist(), ["checked elsewhere", "checked", "checked"]
+        )
+
+    def test_it_should_start_a_new_journal_without_resume(self):
+        journal.start(self.path)
+        self.run_checks(self.df.copy(), [])
+        journal.finish(remove=False)
+
+        checked = []
+        journal.start(self.path)
+        self.run_checks(self.df.copy(), checked)
+        self.assertEqual(len(checked), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
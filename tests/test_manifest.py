@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from src.scripts import manifest
+from src.scripts.async_engine import check_rows, write_rows
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = manifest.manifest_path(os.path.join(self.tmp.name, "Space.csv"))
+        self.dependencies = {"ReadActor": "1.0.0", "Space.csv": "abc"}
+        self.df = pd.DataFrame(
+            {"space_id": ["SP0001", "SP0002", "SP0003"], "note": ["", "", ""]}
+        )
+
+    def tearDown(self):
+        manifest.finish()
+        self.tmp.cleanup()
+
+    def run_checks(self, df, dependencies, checked):
+        def check(index, row):
+            checked.append(row["space_id"])
+            row["note"] = "checked"
+            return row
+
+        manifest.start("Space", self.path, dependencies)
+        write_rows(
+            df, check_rows(df.iterrows(), manifest.skip_verified("Space", check))
+        )
+        manifest.finish()
+        return df
+
+    def test_it_should_check_only_changed_rows(self):
+        checked = []
+        df = self.run_checks(self.df.copy(), self.dependencies, checked)
+        self.assertEqual(checked, ["SP0001", "SP0002", "SP0003"])
+
+        # the checked table is the input of the next run, with one row changed
+        df.loc[1, "note"] = "changed"
+        checked = []
+        df = self.run_checks(df, self.dependencies, checked)
+        self.assertEqual(checked, ["SP0002"])
+        self.assertEqual(df["note"].tolist(), ["checked"] * 3)
+
+    def test_it_should_check_all_rows_if_dependencies_changed(self):
+        df = self.run_checks(self.df.copy(), self.dependencies, [])
+        checked = []
+        self.run_checks(df, {**self.dependencies, "Space.csv": "def"}, checked)
+        self.assertEqual(len(checked), 3)
+
+    def test_unverified_rows(self):
+        df = self.run_checks(self.df.copy(), self.dependencies, [])
+        df.loc[2, "space_id"] = "SP0004"
+        manifest.start("Space", self.path, self.dependencies)
+        self.assertEqual(
+            manifest.unverified("Space", df)["space_id"].tolist(), ["SP0004"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
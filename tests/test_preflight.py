@@ -0,0 +1,101 @@
+import unittest
+
+import pandas as pd
+
+from src.scripts.preflight import find_conflicts, preflight
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df_person_gh = pd.DataFrame(
+            {
+                "person_id": ["AG0001", "AG0001", "AG0002"],
+                "language": ["zh", "en", "zh"],
+                "wikidata_id": ["Q23114", "Q23114", "Q5"],
+            }
+        )
+        self.ids_gh = {"AG0001", "AG0002"}
+        self.wikidata_ids_gh = {"Q23114", "Q5"}
+
+    def test_it_should_report_every_conflict(self):
+        df = pd.DataFrame(
+            {
+                "person_id": ["AG0001", "AG0001", "", "AG0002", "AG0003", "AG0004"],
+                "language": ["zh", "en", "zh", "en", "zh", "zh"],
+                "wikidata_id": ["Q23114", "Q1", "", "Q5", "Q5", "Q6"],
+                "note": ["", "", "", "", "", ""],
+            }
+        )
+        conflicts = find_conflicts(
+            df, "Person", self.df_person_gh, self.ids_gh, self.wikidata_ids_gh
+        )
+        self.assertEqual(
+            conflicts,
+            [
+                "Row 2 has no `person_id`.",
+                "Row 3 : `person_id` AG0002 is in ReadAct, but not in language en.",
+                "Row 1 : `wikidata_id` does not match the one of AG0001 in ReadAct.",
+                "Row 4 : `wikidata_id` Q5 is in ReadAct, but `person_id` AG0003 is not.",
+            ],
+        )
+        with self.assertRaises(SystemExit):
+            preflight(
+                df, "Person", self.df_person_gh, self.ids_gh, self.wikidata_ids_gh
+            )
+
+    def test_skipped_rows_are_not_checked(self):
+        df = pd.DataFrame(
+            {
+                "person_id": ["", "AG0003"],
+                "language": ["zh", "zh"],
+                "wikidata_id": ["", "Q5"],
+                "note": ["skip", "Skip"],
+            }
+        )
+        self.assertEqual(
+            find_conflicts(
+                df, "Person", self.df_person_gh, self.ids_gh, self.wikidata_ids_gh
+            ),
+            [],
+        )
+
+    def test_skip_is_matched_like_the_checks_of_the_rows(self):
+        df = pd.DataFrame(
+            {
+                "person_id": ["AG0003"],
+                "language": ["zh"],
+                "wikidata_id": ["Q5"],
+                "note": ["skip "],
+            }
+        )
+        # `check_each_row_Person` does not skip this row, so it is checked here too
+        self.assertEqual(
+            len(
+                find_conflicts(
+                    df, "Person", self.df_person_gh, self.ids_gh, self.wikidata_ids_gh
+                )
+            ),
+            1,
+        )
+
+    def test_space_ids_must_be_unique(self):
+        df_space_gh = pd.DataFrame(
+            {"space_id": ["SP0001"], "language": ["en"], "wikidata_id": [""]}
+        )
+        df = pd.DataFrame(
+            {
+                "space_id": ["SP0001", "SP0002", "SP0002"],
+                "language": ["en", "en", "zh"],
+                "wikidata_id": ["Q8686", "", ""],
+                "note": ["", "", ""],
+            }
+        )
+        # a Space without wikidata_id in ReadAct takes any wikidata_id
+        self.assertEqual(
+            find_conflicts(df, "Space", df_space_gh, {"SP0001"}, {""}),
+            ["The space_id SP0002 is not unique."],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import unittest
+
+from src.scripts import rate_limiter
+from src.scripts.rate_limiter import TokenBucket, parse_retry_after
+
+
+class MyTestCase(unittest.TestCase):
+    def test_it_should_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("30"), 30.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_it_should_slow_down_and_speed_up(self):
+        bucket = TokenBucket(4.0, 5.0)
+        bucket.slow_down()
+        self.assertEqual(bucket.rate, 2.0)
+        for _ in range(rate_limiter.SPEED_UP_AFTER):
+            bucket.speed_up()
+        self.assertEqual(bucket.rate, 2.0 * rate_limiter.SPEED_UP_FACTOR)
+
+    def test_it_should_wait_for_retry_after(self):
+        bucket = TokenBucket(100.0, 100.0)
+        bucket.slow_down(0.2)
+        start = time.monotonic()
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_it_should_share_bucket_per_host(self):
+        self.assertIs(
+            rate_limiter.get_bucket("https://query.wikidata.org/sparql?query=a"),
+            rate_limiter.get_bucket("https://query.wikidata.org/sparql"),
+        )
+        self.assertEqual(
+            rate_limiter.get_bucket("https://en.wikipedia.org/w/api.php").max_rate,
+            rate_limiter.RATES["wikipedia.org"][1],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import pickle
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src.scripts import shared_frames
+from src.scripts.agent_table_processing import AGENT_GITHUB, SPACE_GITHUB
+from src.scripts.readact_index import ReadActIndex
+
+TABLES = {
+    AGENT_GITHUB: pd.DataFrame(
+        {
+            "agent_id": ["AG0001", "AG0002", "AG0003"],
+            "wikidata_id": ["Q23114", "", "Q42"],
+        }
+    ),
+    SPACE_GITHUB: pd.DataFrame(
+        {
+            "space_id": ["SP0002", "SP0001", "SP0001", "SP0003"],
+            "space_name": ["Beijing", "Shanghai", "上海", "Beijing"],
+            "language": ["en", "en", "zh", "en"],
+            "wikidata_id": ["Q956", "Q8686", "Q8686", None],
+        }
+    ),
+}
+
+
+def fake_read_csv(path, **kwargs):
+    return TABLES[path].copy()
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "src.scripts.readact_snapshot.read_csv", side_effect=fake_read_csv
+        )
+        self.read_csv = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = ReadActIndex()
+
+    def test_agent_maps(self):
+        self.assertEqual(self.index.agent_ids, {"AG0001", "AG0002", "AG0003"})
+        self.assertEqual(self.index.wikidata_ids, {"Q23114", "Q42"})
+
+    def test_space_maps(self):
+        self.assertEqual(self.index.space_ids, {"SP0001", "SP0002", "SP0003"})
+        self.assertEqual(self.index.last_space_id, "SP0003")
+        self.assertIn("Q8686", self.index.space_wikidata_ids)
+        # the first space_id of a reduplicated space_name wins
+        self.assertEqual(self.index.space_names["Beijing"], "SP0002")
+        self.assertEqual(self.index.space_names["上海"], "SP0001")
+        self.assertEqual(self.index.space_names[""], "")
+
+    def test_row_by_id_and_language(self):
+        row = self.index.row("Space", "SP0001", "zh")
+        self.assertEqual(row["space_name"], "上海")
+        with self.assertRaises(KeyError):
+            self.index.row("Space", "SP0001", "fr")
+
+    def test_tables_are_read_once(self):
+        self.index.space_ids
+        self.index.space_names
+        self.index.row("Space", "SP0002", "en")
+        self.assertEqual(self.read_csv.call_count, 1)
+
+    def test_it_should_be_sent_to_a_worker_process(self):
+        self.addCleanup(shared_frames.clear)
+        self.index.space_names
+        index = pickle.loads(pickle.dumps(self.index))
+        self.assertEqual(index.row("Space", "SP0001", "zh")["space_name"], "上海")
+        self.assertEqual(index.last_space_id, "SP0003")
+        self.assertEqual(self.read_csv.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.scripts import readact_snapshot
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        readact_snapshot.configure(directory=self.tmp.name, offline=False)
+        self.url = "https://raw.githubusercontent.com/readchina/ReadAct/master/csv/data/Space.csv"
+        self.content = b"space_id,space_name\nSP0001,Shanghai\n"
+
+    def tearDown(self):
+        readact_snapshot.configure(
+            directory=readact_snapshot.DEFAULT_DIRECTORY, offline=False
+        )
+        self.tmp.cleanup()
+
+    def test_it_should_download_once_per_run(self):
+        with mock.patch(
+            "src.scripts.http_client.get",
+            return_value=FakeResponse(200, self.content, {"ETag": '"abc"'}),
+        ) as get:
+            df = readact_snapshot.read_csv(self.url)
+            df.loc[0, "space_name"] = "changed"
+            df = readact_snapshot.read_csv(self.url)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(df["space_name"].tolist(), ["Shanghai"])
+
+    def test_it_should_revalidate_with_etag(self):
+        with mock.patch(
+            "src.scripts.http_client.get",
+            return_value=FakeResponse(200, self.content, {"ETag": '"abc"'}),
+        ):
+            readact_snapshot.read_csv(self.url)
+        readact_snapshot.configure(offline=False)  # a new run
+        with mock.patch(
+            "src.scripts.http_client.get", return_value=FakeResponse(304)
+        ) as get:
+            df = readact_snapshot.read_csv(self.url)
+        self.assertEqual(get.call_args.kwargs["headers"]["If-None-Match"], '"abc"')
+        self.assertEqual(df["space_id"].tolist(), ["SP0001"])
+
+    def test_it_should_not_download_when_offline(self):
+        with mock.patch(
+            "src.scripts.http_client.get",
+            return_value=FakeResponse(200, self.content),
+        ):
+            version = readact_snapshot.version(self.url)
+        readact_snapshot.configure(offline=True)
+        with mock.patch("src.scripts.http_client.get") as get:
+            df = readact_snapshot.read_csv(self.url)
+            self.assertEqual(readact_snapshot.version(self.url), version)
+        get.assert_not_called()
+        self.assertEqual(len(df.index), 1)
+
+    def test_it_should_exit_when_offline_without_copy(self):
+        readact_snapshot.configure(offline=True)
+        with self.assertRaises(SystemExit):
+            readact_snapshot.read_csv(self.url)
+
+
+if __name__ == "__main__":
+    unittest.main()
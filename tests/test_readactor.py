@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from click.testing import CliRunner
+
+from src.scripts.agent_table_processing import SPACE_GITHUB
+from src.scripts.readact_index import ReadActIndex
+from src.scripts.readactor import cli, create_new_space_entry
+
+SPACE_COLUMNS = [
+    "space_id",
+    "old_id",
+    "space_type",
+    "space_name",
+    "language",
+    "lat",
+    "long",
+    "wikidata_id",
+    "note",
+    "created",
+    "created_by",
+    "last_modified",
+    "last_modified_by",
+]
+
+
+def space_row(space_id, space_name, lat="", long=""):
+    row = dict.fromkeys(SPACE_COLUMNS, "")
+    row.update(
+        space_id=space_id, space_name=space_name, language="en", lat=lat, long=long
+    )
+    return row
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        df_space_gh = pd.DataFrame([space_row("SP0002", "Shanghai", 31.2, 121.4)])
+        patcher = mock.patch(
+            "src.scripts.readact_snapshot.read_csv", return_value=df_space_gh
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name, value in [
+            ("get_QID", None),
+            ("get_coordinates_from_wikidata", {}),
+        ]:
+            patcher = mock.patch("src.scripts.readactor." + name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.readact_index = ReadActIndex()
+
+    def test_new_spaces_follow_the_local_space_table(self):
+        # the local Space table, e.g. extended by the Person table before
+        df_space_user = pd.DataFrame([space_row("SP0100", "Hangzhou", 30.2, 120.1)])
+        df = pd.DataFrame({"place": ["SP0002", "SP0100", "Jixi", "Jixi"]})
+        df_space, added = create_new_space_entry(
+            df,
+            {"SP0002": ["Shanghai", "PL", 31.2, 121.4], "SP0100": None},
+            "2023-05-01",
+            "place",
+            True,
+            "Institution",
+            "Institution.csv",
+            self.readact_index,
+            df_space_user,
+        )
+        self.assertTrue(added)
+        self.assertEqual(df_space["space_id"].tolist(), ["SP0002", "SP0100", "SP0101"])
+        self.assertEqual(df_space["space_name"].tolist()[-1], "Jixi")
+        self.assertEqual(df_space["space_type"].tolist()[-1], "L")
+
+    def test_coordinates_missing_from_the_bulk_query_are_queried_again(self):
+        df = pd.DataFrame({"place": ["Jixi"]})
+        with mock.patch(
+            "src.scripts.readactor.get_QID", return_value={"id": "Q1"}
+        ), mock.patch(
+            "src.scripts.readactor.get_coordinate_from_wikidata",
+            return_value=[["118.6", "30.1"]],
+        ) as get_coordinate:
+            df_space, added = create_new_space_entry(
+                df,
+                {"SP0002": ["Shanghai", "PL", 31.2, 121.4]},
+                "2023-05-01",
+                "place",
+                False,
+                "Institution",
+                "Institution.csv",
+                self.readact_index,
+            )
+        get_coordinate.assert_called_once_with("Q1")
+        self.assertEqual(
+            df_space.iloc[-1][["space_type", "lat", "long", "wikidata_id"]].tolist(),
+            ["PL", "30.1", "118.6", "Q1"],
+        )
+
+    def test_only_the_checked_tables_of_a_directory_get_a_manifest(self):
+        with tempfile.TemporaryDirectory() as d:
+            for name in ["Space.csv", "Person.csv"]:
+                open(os.path.join(d, name), "w").close()
+            with open(os.path.join(d, "Space.manifest.json"), "w") as f:
+                f.write('{"dependencies": {}, "rows": ["verified"]}')
+            with mock.patch("src.scripts.readactor.log"), mock.patch(
+                "src.scripts.readactor.check_directory", return_value={}
+            ) as check_directory, mock.patch(
+                "src.scripts.manifest.dependencies", return_value={}
+            ):
+                result = CliRunner().invoke(cli, [d, "-A", "-I", "-N"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertFalse(check_directory.call_args.kwargs["space"])
+            self.assertTrue(os.path.isfile(os.path.join(d, "Person.manifest.json")))
+            with open(os.path.join(d, "Space.manifest.json")) as f:
+                self.assertIn("verified", f.read())
+
+    def test_a_path_of_the_wrong_table_leaves_no_journal(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "Person.csv")
+            open(path, "w").close()
+            with mock.patch("src.scripts.readactor.log"):
+                result = CliRunner().invoke(cli, [path, "-S", "-N"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(os.listdir(d), ["Person.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import pickle
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src.scripts import shared_frames
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {"space_id": ["SP0001", "SP0002"], "lat": [31.2, 39.9]}, index=[3, 5]
+        )
+        self.addCleanup(shared_frames.clear)
+
+    def test_without_pyarrow_frames_are_pickled(self):
+        with mock.patch("src.scripts.shared_frames.pa", None):
+            value = ("AG0001", self.df)
+            self.assertIs(shared_frames.share(value), value)
+            self.assertIs(shared_frames.share(self.df), self.df)
+
+    @unittest.skipUnless(shared_frames.available(), "pyarrow is not installed")
+    def test_frames_are_written_once_and_read_back(self):
+        shared = shared_frames.share(("AG0001", self.df, self.df))
+        self.assertEqual(shared[0], "AG0001")
+        self.assertIs(shared[1], shared[2])
+        self.assertIs(shared_frames.share(self.df), shared[1])
+        # a worker process gets the dataframe back, a reference is unpickled once
+        _, df, df_again = pickle.loads(pickle.dumps(shared))
+        pd.testing.assert_frame_equal(df, self.df, check_dtype=False)
+        self.assertIs(df, df_again)
+
+        shared_frames.clear()
+        self.assertFalse(os.path.exists(shared[1].path))
+
+    @unittest.skipUnless(shared_frames.available(), "pyarrow is not installed")
+    def test_the_readact_tables_are_shared(self):
+        # read like the ReadAct tables: numeric columns with "" for missing values, e.g. `birthyear` and `start`
+        directory = os.path.join(os.path.dirname(__file__), "..", "src", "CSV")
+        frames = tuple(
+            pd.read_csv(os.path.join(directory, name)).fillna("")
+            for name in ["Person.csv", "Institution.csv", "Space.csv"]
+        )
+        shared = shared_frames.share(frames)
+        for frame in shared:
+            self.assertIsInstance(frame, shared_frames.SharedFrame)
+        for frame, df in zip(frames, pickle.loads(pickle.dumps(shared))):
+            for column in frame.columns:
+                self.assertEqual(df[column].tolist(), frame[column].tolist())
+                self.assertEqual(
+                    [type(v) for v in df[column]], [type(v) for v in frame[column]]
+                )
+
+    @unittest.skipUnless(shared_frames.available(), "pyarrow is not installed")
+    def test_a_frame_arrow_cannot_convert_is_pickled(self):
+        df_dates = pd.DataFrame({"start": [1912, "1920?"], "end": [1949, ""]})
+        with self.assertLogs(shared_frames.logger, "WARNING"):
+            shared = shared_frames.share((df_dates, self.df))
+        self.assertIs(shared[0], df_dates)
+        self.assertIsInstance(shared[1], shared_frames.SharedFrame)
+        self.assertEqual(
+            os.listdir(os.path.dirname(shared[1].path)),
+            [os.path.basename(shared[1].path)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
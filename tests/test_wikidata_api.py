@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+from src.scripts import wikidata_api
+from src.scripts.authenticity_institution import sparql_insts
+from src.scripts.authenticity_person import sparql_with_Qids
+from src.scripts.authenticity_space import get_coordinates_from_wikidata
+
+
+def statement(value, rank="normal"):
+    return {"mainsnak": {"datavalue": {"value": value}}, "rank": rank}
+
+
+ENTITIES = {
+    "Q23114": {
+        "labels": {"en": {"value": "Lu Xun"}},
+        "sitelinks": {"enwiki": {"title": "Lu Xun"}},
+        "claims": {
+            "P21": [statement({"id": "Q6581097"})],
+            "P569": [statement({"time": "+1881-09-25T00:00:00Z"})],
+            "P570": [statement({"time": "+1936-10-19T00:00:00Z"})],
+            "P19": [
+                statement({"id": "Q1"}, "deprecated"),
+                statement({"id": "Q5673"}),
+            ],
+            "P625": [statement({"latitude": 30.0, "longitude": 120.5})],
+            "P571": [statement({"time": "+1897-00-00T00:00:00Z"})],
+            "P159": [statement({"id": "Q5673"}), statement({"id": "Q8686"})],
+        },
+    },
+    "Q6581097": {"labels": {"en": {"value": "male"}}},
+    "Q5673": {"labels": {"en": {"value": "Shaoxing"}}},
+    "Q8686": {"labels": {}},
+}
+
+
+def fake_get_json(url, params=None, **kwargs):
+    ids = params["ids"].split("|")
+    return {"entities": {q: ENTITIES.get(q, {"id": q, "missing": ""}) for q in ids}}
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        wikidata_api.configure(backend="wbgetentities")
+        patcher = mock.patch(
+            "src.scripts.http_client.get_json", side_effect=fake_get_json
+        )
+        self.get_json = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(wikidata_api.configure, backend="sparql")
+
+    def test_persons(self):
+        self.assertEqual(
+            sparql_with_Qids(["Q23114", "Q404"]),
+            {
+                "Q23114": {
+                    "Q-id": "Q23114",
+                    "name": "Lu Xun",
+                    "gender": "male",
+                    "birthyear": "1881",
+                    "deathyear": "1936",
+                    "birthplace": "Shaoxing",
+                },
+                "Q404": {},
+            },
+        )
+        # one request for the items and one for the labels of the items they refer to
+        self.assertEqual(self.get_json.call_count, 2)
+
+    def test_a_missing_referenced_item_is_labelled_with_its_id(self):
+        with mock.patch.dict(
+            ENTITIES,
+            {"Q5": {"labels": {}, "claims": {"P19": [statement({"id": "Q405"})]}}},
+        ):
+            self.assertEqual(
+                sparql_with_Qids(["Q5"])["Q5"],
+                {"Q-id": "Q5", "name": "Q5", "birthplace": "Q405"},
+            )
+
+    def test_institutions(self):
+        inst_wiki = sparql_insts(["Q23114"])["Q23114"]
+        # an item without English label is labelled with its ID, like in SPARQL
+        self.assertEqual(inst_wiki["headquarters"], ["Shaoxing", "Q8686"])
+        self.assertEqual(inst_wiki["inception"], ["1897-01-01T00:00:00Z"])
+        # an item without article has no properties, like in SPARQL
+        self.assertEqual(sparql_insts(["Q5673"])["Q5673"]["headquarters"], [])
+
+    def test_coordinates(self):
+        self.assertEqual(
+            get_coordinates_from_wikidata(["Q23114", "Q5673"]),
+            {"Q23114": [["120.5", "30.0"]], "Q5673": []},
+        )
+
+    def test_it_should_be_chunked(self):
+        wikidata_api.get_entities(["Q%s" % i for i in range(1, 121)])
+        self.assertEqual(self.get_json.call_count, 3)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            wikidata_api.configure(backend="nope")
+
+
+if __name__ == "__main__":
+    unittest.main()